@@ -0,0 +1,522 @@
+import threading
+import time
+import traceback
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """Preallocated single-producer/single-consumer ring of audio frames.
+
+    The PortAudio callback is the only writer and the sink thread the only
+    reader.  Each side advances just its own counter after copying, so no lock
+    is needed and the callback never blocks; if the reader falls behind, the
+    incoming block is dropped and counted in `overruns`.
+    """
+
+    def __init__(self, capacity, channels, dtype=np.float32):
+        self.capacity = int(capacity)
+        self.channels = channels
+        self._buffer = np.zeros((self.capacity, channels), dtype=dtype)
+        self._write_pos = 0
+        self._read_pos = 0
+        self.overruns = 0
+
+    def available(self):
+        return self._write_pos - self._read_pos
+
+    def write(self, block):
+        """Copy a block in; returns False (and counts an overrun) if it does not fit."""
+        frames = len(block)
+        if frames > self.capacity - (self._write_pos - self._read_pos):
+            self.overruns += 1
+            return False
+        start = self._write_pos % self.capacity
+        first = min(frames, self.capacity - start)
+        self._buffer[start:start + first] = block[:first]
+        if first < frames:
+            self._buffer[:frames - first] = block[first:]
+        self._write_pos += frames
+        return True
+
+    def read(self, max_frames=None):
+        """Return a copy of up to max_frames buffered frames (possibly empty)."""
+        frames = self._write_pos - self._read_pos
+        if max_frames is not None:
+            frames = min(frames, max_frames)
+        start = self._read_pos % self.capacity
+        first = min(frames, self.capacity - start)
+        if first == frames:
+            data = self._buffer[start:start + frames].copy()
+        else:
+            data = np.concatenate((self._buffer[start:], self._buffer[:frames - first]))
+        self._read_pos += frames
+        return data
+
+
+class StreamingAudioWriter:
+    """Background thread draining an AudioRingBuffer into a sink.
+
+    The sink only needs write(ndarray) and close(), so an open
+    soundfile.SoundFile works directly.
+    """
+
+    def __init__(self, ring, sink, poll_interval=0.05):
+        self.ring = ring
+        self.sink = sink
+        self.poll_interval = poll_interval
+        self.frames_written = 0
+        self._splits = []
+        self._splits_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def split_at(self, position, new_sink):
+        """Switch to new_sink once `position` frames have been written in total.
+
+        Returns an Event that is set after the previous sink has been closed.
+        """
+        done = threading.Event()
+        with self._splits_lock:
+            self._splits.append((position, new_sink, done))
+        return done
+
+    def _drain(self):
+        data = self.ring.read()
+        while True:
+            with self._splits_lock:
+                split = self._splits[0] if self._splits else None
+            if split is None or self.frames_written + len(data) < split[0]:
+                break
+            position, new_sink, done = split
+            # Audio that already went past the boundary stays in the old sink
+            head = max(0, position - self.frames_written)
+            if head:
+                self.sink.write(data[:head])
+                self.frames_written += head
+            data = data[head:]
+            try:
+                self.sink.close()
+            finally:
+                self.sink = new_sink
+                with self._splits_lock:
+                    self._splits.pop(0)
+                done.set()
+        if len(data):
+            self.sink.write(data)
+            self.frames_written += len(data)
+
+    def _run(self):
+        try:
+            while not self._stop_event.wait(self.poll_interval):
+                self._drain()
+        except Exception as e:
+            print(f"Error writing audio: {str(e)}")
+            traceback.print_exc()
+
+    def stop(self, timeout=2.0):
+        """Stop the thread, flush whatever is left in the ring and close the sink."""
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        try:
+            self._drain()
+        finally:
+            self.sink.close()
+            # Splits the audio never reached still get their sinks closed
+            with self._splits_lock:
+                pending, self._splits = self._splits, []
+            for _, new_sink, done in pending:
+                new_sink.close()
+                done.set()
+        if self.ring.overruns:
+            print(f"Audio ring buffer overran {self.ring.overruns} times")
+
+
+class AudioSource:
+    """One input device being recorded: its own ring, clock alignment and mix gain."""
+
+    def __init__(self, name, samplerate, channels, capacity, gain=1.0):
+        self.name = name
+        self.channels = channels
+        self.gain = gain
+        self.ring = AudioRingBuffer(capacity, channels)
+        self.sync = AudioSync(samplerate)
+        self.stream = None
+
+
+class AudioMixer:
+    """Background thread combining several AudioSources into one output ring.
+
+    Every source's AudioSync has already put its samples on media time, so
+    frame n of each ring belongs to the same instant and aligning them is
+    just reading the same number of frames from each.  Each pass takes
+    everything all sources have in common and applies the per-source gains
+    to the whole batch in one NumPy operation:
+
+    - mode "mix": one track, the gain-weighted sum clipped to [-1, 1];
+    - mode "separate": each source's channels side by side, one track per
+      source for the muxer to split.
+
+    Mono sources are spread over every output channel.  A source that falls
+    more than stall_seconds behind the others (a loopback device with
+    nothing playing, an unplugged mic) is filled with silence so the rest
+    keep flowing; audio it delivers late for that stretch is discarded.
+    """
+
+    def __init__(self, sources, out_ring, channels, mode="mix", samplerate=44100, poll_interval=0.02,
+                 stall_seconds=0.5):
+        if mode not in ("mix", "separate"):
+            raise ValueError(f"Unknown audio mix mode: {mode}")
+        self.sources = sources
+        self.out_ring = out_ring
+        self.channels = channels
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.stall_frames = int(stall_seconds * samplerate)
+        self.gains = np.array([source.gain for source in sources], dtype=np.float32)
+        self.filled = [0] * len(sources)  # frames of silence stood in for each source
+        self._skip = [0] * len(sources)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="audio-mixer")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            while not self._stop_event.wait(self.poll_interval):
+                self.mix_available()
+        except Exception as e:
+            print(f"Error mixing audio: {str(e)}")
+            traceback.print_exc()
+
+    def mix_available(self, flush=False):
+        """Mix what every source has in common; with flush, everything any source has."""
+        for index, source in enumerate(self.sources):
+            # Drop late audio for a stretch that was already filled with silence
+            if self._skip[index]:
+                self._skip[index] -= len(source.ring.read(self._skip[index]))
+        available = [source.ring.available() for source in self.sources]
+        frames = min(available)
+        lead = max(available)
+        if flush:
+            frames = lead
+        elif lead - frames > self.stall_frames:
+            frames = lead - self.stall_frames
+        # Keep within what the output ring can take
+        frames = min(frames, self.out_ring.capacity - self.out_ring.available())
+        if frames <= 0:
+            return 0
+
+        batch = np.zeros((len(self.sources), frames, self.channels), dtype=np.float32)
+        for index, source in enumerate(self.sources):
+            data = source.ring.read(frames)
+            got = len(data)
+            # Sources stop a few frames apart; only count stalls, not the final flush
+            if got < frames and not flush:
+                self.filled[index] += frames - got
+                self._skip[index] += frames - got
+            if got:
+                # Mono spreads over every channel; extra channels are dropped
+                batch[index, :got] = data[:, :self.channels] if data.shape[1] >= self.channels else data[:, :1]
+
+        if self.mode == "mix":
+            mixed = np.tensordot(self.gains, batch, axes=1)
+            np.clip(mixed, -1.0, 1.0, out=mixed)
+        else:
+            batch *= self.gains[:, np.newaxis, np.newaxis]
+            # (sources, frames, channels) -> (frames, sources * channels)
+            mixed = batch.transpose(1, 0, 2).reshape(frames, -1)
+        self.out_ring.write(mixed)
+        return frames
+
+    def stop(self, timeout=1.0):
+        """Stop the thread and flush whatever the sources still hold."""
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self.mix_available(flush=True)
+
+
+class AudioSync:
+    """Keeps recorded audio on the video's media clock.
+
+    Video frames are stamped by FrameScheduler with media time: the
+    monotonic clock since recording started, paused time excluded.  Each
+    audio block is stamped on the same clock from PortAudio's
+    inputBufferAdcTime, and align() returns the block to write so that
+    output sample n plays at media time n / samplerate:
+
+    - the first block, and the first after each pause (a new `run`), is
+      padded with silence or trimmed to its exact position;
+    - errors above hard_threshold seconds (dropped blocks, stalls) are
+      filled or cut at once;
+    - slow drift between the sound card and system clocks is removed by
+      stretching blocks by at most max_stretch whenever the smoothed error
+      exceeds tolerance seconds.
+
+    Whatever consumes the stream (a WAV segment or ffmpeg's live audio
+    input) then needs no offset or resampling of its own.
+    """
+
+    def __init__(self, samplerate, tolerance=0.02, hard_threshold=0.2, max_stretch=0.005, smoothing=0.05):
+        self.samplerate = samplerate
+        self.tolerance = tolerance * samplerate
+        self.hard_threshold = hard_threshold * samplerate
+        self.max_stretch = max_stretch
+        self.smoothing = smoothing
+        self.position = 0  # samples handed out
+        self.start_offset = None  # media time of the first audio sample, in seconds
+        self.error = 0.0  # smoothed samples handed out minus samples due
+        self.padded = 0
+        self.trimmed = 0
+        self.stretched = 0  # net samples removed (+) or added (-) by stretching
+        self._run = None
+        # Least-squares fit of received samples against media time, for the drift
+        # estimate; each unpaused run gets its own intercept
+        self._received = 0
+        self._first_time = None
+        self._fit = np.zeros(5)  # this run's n, sum t, sum p, sum tt, sum tp
+        self._pooled = np.zeros(2)  # earlier runs' centred sum tt, sum tp
+
+    def block_time(self, time_info, frames, now):
+        """Clock time of a block's first sample; `now` is the callback's clock reading."""
+        adc = getattr(time_info, 'inputBufferAdcTime', 0.0) if time_info is not None else 0.0
+        current = getattr(time_info, 'currentTime', 0.0) if time_info is not None else 0.0
+        if adc and current:
+            # PortAudio's stream clock has its own epoch; only the latency carries over
+            return now - (current - adc)
+        # Host API without timestamps: the block finished arriving about now
+        return now - frames / self.samplerate
+
+    def align(self, block, media_time, run=None):
+        """Return `block` padded, trimmed or stretched to keep the output on media time.
+
+        `run` identifies the unpaused stretch the block belongs to; when it
+        changes, the block is placed exactly and drift fitting starts over.
+        """
+        frames = len(block)
+        if run != self._run:
+            self._run = run
+            self._new_run()
+        self._add_point(media_time, frames)
+        error = self.position - media_time * self.samplerate
+        if self.start_offset is None or self._fit[0] == 1:
+            if self.start_offset is None:
+                self.start_offset = media_time
+            block = self._hard_correct(block, error)
+            self.error = 0.0
+        elif abs(error) > self.hard_threshold:
+            block = self._hard_correct(block, error)
+            self.error = 0.0
+        else:
+            self.error += self.smoothing * (error - self.error)
+            if abs(self.error) > self.tolerance and frames > 1:
+                limit = max(1, int(frames * self.max_stretch))
+                change = int(max(-limit, min(limit, round(self.error))))
+                block = _stretch(block, frames - change)
+                self.error -= change
+                self.stretched += change
+        self.position += len(block)
+        return block
+
+    def _hard_correct(self, block, error):
+        error = int(round(error))
+        if error < 0:
+            # Audio is behind: fill the gap with silence
+            self.padded += -error
+            return np.concatenate((np.zeros((-error,) + block.shape[1:], dtype=block.dtype), block))
+        trim = min(error, len(block))
+        self.trimmed += trim
+        return block[trim:]
+
+    def _new_run(self):
+        n, st, sp, stt, stp = self._fit
+        if n:
+            self._pooled += (stt - st * st / n, stp - st * sp / n)
+        self._fit[:] = 0
+        self._received = 0
+        self._first_time = None
+
+    def _add_point(self, media_time, frames):
+        if self._first_time is None:
+            self._first_time = media_time
+        t = media_time - self._first_time
+        self._fit += (1.0, t, self._received, t * t, t * self._received)
+        self._received += frames
+
+    def drift_ppm(self):
+        """Sound card clock rate relative to the system clock, in parts per million."""
+        n, st, sp, stt, stp = self._fit
+        sxx, sxy = self._pooled
+        if n:
+            sxx += stt - st * st / n
+            sxy += stp - st * sp / n
+        # Wait for a few seconds of audio before trusting the slope
+        if sxx < 1.0:
+            return None
+        slope = sxy / sxx
+        return float((slope / self.samplerate - 1.0) * 1e6)
+
+    def summary(self):
+        drift = self.drift_ppm()
+        return {
+            'start_offset_ms': None if self.start_offset is None else self.start_offset * 1000,
+            'drift_ppm': drift,
+            'sync_error_ms': self.error / self.samplerate * 1000,
+            'padded_frames': self.padded,
+            'trimmed_frames': self.trimmed,
+            'stretched_frames': self.stretched,
+        }
+
+
+def _stretch(block, length):
+    """Linearly resample a (frames, channels) block to `length` frames."""
+    frames = len(block)
+    source = np.linspace(0, frames - 1, length)
+    positions = np.arange(frames)
+    out = np.empty((length,) + block.shape[1:], dtype=block.dtype)
+    if block.ndim == 1:
+        out[:] = np.interp(source, positions, block)
+    else:
+        for channel in range(block.shape[1]):
+            out[:, channel] = np.interp(source, positions, block[:, channel])
+    return out
+
+
+class _BlockTime:
+    """The inputBufferAdcTime/currentTime pair PortAudio hands to callbacks."""
+
+    def __init__(self, adc_time, current_time):
+        self.inputBufferAdcTime = adc_time
+        self.currentTime = current_time
+
+
+class AudioMeter:
+    """Per-channel peak and RMS levels shared by the audio callback and the UI.
+
+    update() runs in the audio callback and only folds each block into a
+    few small preallocated arrays: the running peak and a sum of squares
+    taken over every `stride`-th frame.  The UI calls read() at its own rate,
+    which coalesces every block since the previous read into one peak and
+    one RMS per channel and applies peak hold.  Nothing is posted to the UI
+    from the audio thread; a block landing mid-read is merged into the next
+    reading or lost, which no meter could show anyway.
+    """
+
+    def __init__(self, channels, stride=4, hold_seconds=1.5, floor_db=-60.0):
+        self.channels = channels
+        self.stride = max(1, int(stride))
+        self.hold_seconds = hold_seconds
+        self.floor_db = floor_db
+        self._peak = np.zeros(channels, dtype=np.float32)
+        self._square_sum = np.zeros(channels, dtype=np.float64)
+        self._frames = 0
+        self.peak = np.zeros(channels, dtype=np.float32)
+        self.rms = np.zeros(channels, dtype=np.float32)
+        self.hold = np.zeros(channels, dtype=np.float32)
+        self._hold_until = np.zeros(channels, dtype=np.float64)
+
+    def update(self, block):
+        """Fold one (frames, channels) float block into the pending levels."""
+        np.maximum(self._peak, block.max(axis=0), out=self._peak)
+        np.maximum(self._peak, -block.min(axis=0), out=self._peak)
+        sampled = block[::self.stride]
+        self._square_sum += np.einsum('ij,ij->j', sampled, sampled)
+        self._frames += len(sampled)
+
+    def read(self):
+        """Return (peak, rms, hold) per channel as linear levels in 0..1."""
+        frames = self._frames
+        if frames:
+            self.peak[:] = self._peak
+            self.rms[:] = np.sqrt(self._square_sum / frames)
+            self._peak[:] = 0
+            self._square_sum[:] = 0
+            self._frames = 0
+        else:
+            # No audio since the last read: the meter falls back to silence
+            self.peak[:] = 0
+            self.rms[:] = 0
+        now = time.monotonic()
+        expired = now >= self._hold_until
+        raised = (self.peak >= self.hold) | expired
+        self.hold[raised] = self.peak[raised]
+        self._hold_until[raised & (self.peak > 0)] = now + self.hold_seconds
+        return self.peak, self.rms, self.hold
+
+    def reset(self):
+        for levels in (self._peak, self._square_sum, self.peak, self.rms, self.hold, self._hold_until):
+            levels[:] = 0
+        self._frames = 0
+
+    def fraction(self, level):
+        """Map a linear level onto 0..1 on a dB scale from floor_db to 0 dBFS."""
+        if level <= 0:
+            return 0.0
+        db = 20 * np.log10(level)
+        return float(min(1.0, max(0.0, 1.0 - db / self.floor_db)))
+
+
+class SyntheticAudioStream:
+    """Stand-in for sounddevice.InputStream that feeds a sine tone in real time.
+
+    Calls callback(indata, frames, time_info, status) from its own thread with
+    float32 blocks at the stream's sample rate, so the audio path can be run
+    and benchmarked without a microphone.  drift_ppm runs its "sound card"
+    clock fast (or slow, if negative) against the system clock, to exercise
+    drift correction.
+    """
+
+    def __init__(self, samplerate=44100, channels=2, callback=None, blocksize=1024, frequency=440.0,
+                 drift_ppm=0.0):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.callback = callback
+        self.blocksize = blocksize
+        self.frequency = frequency
+        self.drift_ppm = drift_ppm
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        block_seconds = self.blocksize / (self.samplerate * (1.0 + self.drift_ppm * 1e-6))
+        position = 0
+        start = time.monotonic()
+        blocks = 0
+        while not self._stop_event.is_set():
+            t = (position + np.arange(self.blocksize)) / self.samplerate
+            tone = (0.2 * np.sin(2 * np.pi * self.frequency * t)).astype(np.float32)
+            block = np.repeat(tone[:, np.newaxis], self.channels, axis=1)
+            try:
+                now = time.monotonic()
+                # Like PortAudio: the block's first sample was captured one block ago
+                self.callback(block, self.blocksize, _BlockTime(now - block_seconds, now), None)
+            except Exception as e:
+                print(f"Error in synthetic audio callback: {str(e)}")
+                traceback.print_exc()
+                return
+            position += self.blocksize
+            blocks += 1
+            # Pace blocks on a fixed schedule like a sound card would
+            delay = start + blocks * block_seconds - time.monotonic()
+            if delay > 0:
+                self._stop_event.wait(delay)
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+
+    def close(self):
+        self.stop()
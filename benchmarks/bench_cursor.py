@@ -0,0 +1,81 @@
+"""Micro-benchmark: fixed-point CursorCompositor vs the original float64 blend.
+
+Usage: python benchmarks/bench_cursor.py [--width 3840] [--height 2160] [--iterations 5000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cursor_compositor import CursorCompositor  # noqa: E402
+
+
+def legacy_overlay(cursor_image, frame, x, y):
+    # The per-frame float64 blend ScreenRecorder.overlay_cursor used before
+    h, w = cursor_image.shape[:2]
+    y1, y2 = max(0, y), min(frame.shape[0], y + h)
+    x1, x2 = max(0, x), min(frame.shape[1], x + w)
+    if y2 > y1 and x2 > x1:
+        cursor_y1 = max(0, -y)
+        cursor_x1 = max(0, -x)
+        cursor_y2 = cursor_y1 + (y2 - y1)
+        cursor_x2 = cursor_x1 + (x2 - x1)
+        alpha = cursor_image[cursor_y1:cursor_y2, cursor_x1:cursor_x2, 3:4].astype(float) / 255.0
+        cursor_rgb = cursor_image[cursor_y1:cursor_y2, cursor_x1:cursor_x2, :3]
+        frame_region = frame[y1:y2, x1:x2]
+        blended = frame_region * (1 - alpha) + cursor_rgb * alpha
+        frame[y1:y2, x1:x2] = blended.astype(np.uint8)
+    return frame
+
+
+def make_cursor(size=32, seed=0):
+    rng = np.random.default_rng(seed)
+    cursor = rng.integers(0, 256, (size, size, 4), dtype=np.uint8)
+    cursor[: size // 4, :, 3] = 0  # fully transparent rows
+    cursor[-size // 4:, :, 3] = 255  # fully opaque rows
+    return cursor
+
+
+def bench(func, frame, positions):
+    start = time.perf_counter()
+    for x, y in positions:
+        func(frame, x, y)
+    return (time.perf_counter() - start) / len(positions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--cursor-size", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    cursor = make_cursor(args.cursor_size)
+    compositor = CursorCompositor(cursor)
+    rng = np.random.default_rng(1)
+    frame = rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    # Include positions that clip against the right/bottom edges
+    positions = list(zip(rng.integers(0, args.width, args.iterations).tolist(),
+                         rng.integers(0, args.height, args.iterations).tolist()))
+
+    # Results agree to within the float version's truncation
+    a = legacy_overlay(cursor, frame.copy(), 10, 10)
+    b = compositor.composite(frame.copy(), 10, 10)
+    max_diff = int(np.abs(a.astype(np.int16) - b.astype(np.int16)).max())
+
+    legacy = bench(lambda f, x, y: legacy_overlay(cursor, f, x, y), frame, positions)
+    fixed = bench(compositor.composite, frame, positions)
+
+    print(f"frame {args.width}x{args.height}, cursor {args.cursor_size}px, {args.iterations} iterations")
+    print(f"legacy float64 blend: {legacy * 1e6:8.2f} us/frame")
+    print(f"fixed-point blend:    {fixed * 1e6:8.2f} us/frame")
+    print(f"speedup: {legacy / fixed:.2f}x, max pixel difference: {max_diff}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""End-to-end benchmark of ScreenRecorder with synthetic frames and audio.
+
+Each resolution is recorded in a fresh child process (so peak RSS is per
+run) from the synthetic capture backend, with a generated tone as the
+microphone and a moving pointer so the cursor overlay is exercised.  Reports
+per-stage latency, sustained FPS, dropped frames and peak RSS, and with
+--json writes everything to a file that can be compared across commits.
+
+Usage: python benchmarks/bench_pipeline.py [--resolutions 720p 1080p 4k] [--duration 5]
+                                           [--fps 30] [--json results.json]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+RESOLUTIONS = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+}
+
+
+def parse_resolution(text):
+    if text.lower() in RESOLUTIONS:
+        return RESOLUTIONS[text.lower()]
+    width, height = (int(v) for v in text.lower().split("x"))
+    return width, height
+
+
+def peak_rss_mb(who="self"):
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_one(args, label):
+    """Record once in this process and return the result dict."""
+    from screen_recorder import ScreenRecorder
+
+    size = parse_resolution(label)
+    recorder = ScreenRecorder()
+    recorder.output_dir = args.workdir
+    recorder.custom_filename = f"bench_{label}"
+    recorder.capture_backend = "synthetic"
+    recorder.capture_backend_options = {"size": size}
+    recorder.fps = args.fps
+    recorder.output_resolution = args.output_resolution
+    recorder.output_mode = args.output_mode
+    recorder.encode_processes = args.processes
+    if args.audio:
+        recorder.audio_backend = "synthetic"
+
+    # Pointer circling the screen centre
+    def locator():
+        t = time.perf_counter()
+        return (int(size[0] / 2 + size[0] / 3 * math.cos(t)),
+                int(size[1] / 2 + size[1] / 3 * math.sin(t)))
+    recorder.cursor_locator = locator
+    if args.preview:
+        recorder.set_preview_callback(lambda frame: None)
+
+    recorder.start_recording()
+    started = time.perf_counter()
+    audio_ring = recorder.audio_ring
+    audio_writer = recorder.audio_writer
+    time.sleep(args.duration)
+    elapsed = time.perf_counter() - started
+    stop_started = time.perf_counter()
+    recorder.stop_recording()
+    stop_seconds = time.perf_counter() - stop_started
+
+    frames = recorder.get_frame_stats()
+    stages = recorder.get_stage_stats()
+    grabbed = stages["grab"]["count"]
+    result = {
+        "resolution": label,
+        "capture_size": list(size),
+        "output_size": list(recorder.frame_size),
+        "duration_s": elapsed,
+        "target_fps": args.fps,
+        "captured_fps": grabbed / elapsed,
+        "encoded_fps": (frames["written"] - frames["duplicated"]) / elapsed,
+        "frames": frames,
+        "stages": stages,
+        "pool": recorder.get_pool_stats(),
+        "stop_s": stop_seconds,
+        "peak_rss_mb": peak_rss_mb("self"),
+        "children_peak_rss_mb": peak_rss_mb("children") if args.processes else None,
+    }
+    if audio_ring is not None:
+        result["audio"] = {
+            "frames_written": audio_writer.frames_written,
+            "overruns": audio_ring.overruns,
+        }
+    return result
+
+
+def run_child(args, label):
+    """Run one resolution in a fresh interpreter and parse its JSON result."""
+    command = [sys.executable, os.path.abspath(__file__), "--child", label,
+               "--duration", str(args.duration), "--fps", str(args.fps),
+               "--output-resolution", str(args.output_resolution), "--output-mode", args.output_mode,
+               "--processes", str(args.processes), "--workdir", args.workdir]
+    if not args.audio:
+        command.append("--no-audio")
+    if not args.preview:
+        command.append("--no-preview")
+    result = subprocess.run(command, cwd=REPO_DIR, capture_output=True, text=True)
+    # The recorder logs to stdout as well; the result is the last line
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        print(result.stdout[-2000:])
+        print(result.stderr[-2000:])
+        raise RuntimeError(f"Benchmark run for {label} failed")
+    return json.loads(lines[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_table(runs):
+    stages = list(runs[0]["stages"]) if runs else []
+    print(f"{'resolution':>10} {'cap fps':>8} {'enc fps':>8} {'dropped':>8} {'dup':>5} {'rss MB':>7}  "
+          + " ".join(f"{stage + ' p50/p95':>17}" for stage in stages) + "  (ms)")
+    for run in runs:
+        cells = " ".join(f"{run['stages'][stage]['p50_ms']:8.2f}/{run['stages'][stage]['p95_ms']:<8.2f}"
+                         for stage in stages)
+        rss = run["peak_rss_mb"]
+        print(f"{run['resolution']:>10} {run['captured_fps']:8.1f} {run['encoded_fps']:8.1f} "
+              f"{run['frames']['dropped']:8d} {run['frames']['duplicated']:5d} "
+              f"{rss if rss is None else format(rss, '7.0f'):>7}  {cells}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resolutions", nargs="*", default=["720p", "1080p", "4k"],
+                        help="capture sizes: 720p, 1080p, 1440p, 4k or WxH")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds recorded per resolution")
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--output-resolution", default="native")
+    parser.add_argument("--output-mode", default="opencv", choices=["opencv", "ffmpeg"])
+    parser.add_argument("--processes", type=int, default=0)
+    parser.add_argument("--no-audio", dest="audio", action="store_false")
+    parser.add_argument("--no-preview", dest="preview", action="store_false")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_one(args, args.child)
+        print(json.dumps(result))
+        return 0
+
+    with tempfile.TemporaryDirectory() as workdir:
+        args.workdir = workdir
+        runs = []
+        for label in args.resolutions:
+            print(f"Recording {label} for {args.duration:g}s...")
+            runs.append(run_child(args, label))
+
+    print_table(runs)
+    if args.json:
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "duration_s": args.duration,
+                "fps": args.fps,
+                "output_resolution": args.output_resolution,
+                "output_mode": args.output_mode,
+                "processes": args.processes,
+                "audio": args.audio,
+                "preview": args.preview,
+            },
+            "runs": runs,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Throughput of the convert -> cursor -> encode path for each output resolution preset.
+
+Frames come from the synthetic capture backend, so no display is needed.
+
+Usage: python benchmarks/bench_scaling.py [--source 3840x2160] [--frames 120]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_backends import open_backend, to_bgr  # noqa: E402
+from cursor_compositor import CursorCompositor  # noqa: E402
+from frame_pipeline import OUTPUT_PRESETS, downscale_for_encode, resolve_output_size  # noqa: E402
+
+
+def run_preset(preset, source_size, frames, workdir):
+    backend = open_backend("synthetic", buffers=2, size=source_size)
+    out_size = resolve_output_size(preset, backend.size)
+    cursor = np.zeros((32, 32, 4), dtype=np.uint8)
+    cursor[:, :, :3] = 255
+    cursor[:, :, 3] = 200
+    compositor = CursorCompositor(cursor)
+    path = os.path.join(workdir, f"bench_{preset}.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30.0, out_size)
+
+    # Preallocated like the recorder's frame pool and convert scratch buffer
+    frame = np.empty((out_size[1], out_size[0], 3), dtype=np.uint8)
+    scratch = None
+    timings = {"grab": 0.0, "convert": 0.0, "cursor": 0.0, "encode": 0.0}
+    start = time.perf_counter()
+    try:
+        for i in range(frames):
+            t0 = time.perf_counter()
+            view = backend.grab()
+            t1 = time.perf_counter()
+            if view.shape[1::-1] != out_size:
+                scratch = downscale_for_encode(view, out_size, out=scratch)
+                to_bgr(scratch, backend.pixel_format, out=frame)
+            else:
+                to_bgr(view, backend.pixel_format, out=frame)
+            t2 = time.perf_counter()
+            compositor.composite(frame, (i * 7) % out_size[0], (i * 5) % out_size[1])
+            t3 = time.perf_counter()
+            writer.write(frame)
+            t4 = time.perf_counter()
+            timings["grab"] += t1 - t0
+            timings["convert"] += t2 - t1
+            timings["cursor"] += t3 - t2
+            timings["encode"] += t4 - t3
+    finally:
+        writer.release()
+        backend.close()
+        if os.path.exists(path):
+            os.remove(path)
+    elapsed = time.perf_counter() - start
+    return out_size, frames / elapsed, {k: v / frames * 1000 for k, v in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default="3840x2160", help="synthetic screen size, WxH")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--presets", nargs="*", default=list(OUTPUT_PRESETS))
+    args = parser.parse_args()
+    source_size = tuple(int(v) for v in args.source.lower().split("x"))
+
+    print(f"source {source_size[0]}x{source_size[1]}, {args.frames} frames per preset")
+    print(f"{'preset':>8} {'output':>11} {'fps':>7} {'grab':>7} {'convert':>8} {'cursor':>7} {'encode':>7}  (ms/frame)")
+    with tempfile.TemporaryDirectory() as workdir:
+        for preset in args.presets:
+            out_size, fps, ms = run_preset(preset, source_size, args.frames, workdir)
+            print(f"{preset:>8} {out_size[0]:>5}x{out_size[1]:<5} {fps:7.1f} {ms['grab']:7.2f} "
+                  f"{ms['convert']:8.2f} {ms['cursor']:7.2f} {ms['encode']:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
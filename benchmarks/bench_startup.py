@@ -0,0 +1,116 @@
+"""Cold-start cost: recorder import time and time until the GUI window first paints.
+
+Each measurement runs in a fresh interpreter so module caches do not hide
+import costs.  The window measurement needs a display and customtkinter and
+is skipped without them.  Pass --max-import-ms / --max-window-ms to exit
+non-zero when a limit is exceeded, e.g. in CI.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--max-import-ms 800] [--max-window-ms 2000]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Peak RSS in MB, or None where the resource module is missing (Windows)
+PEAK_RSS = """
+import sys
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+"""
+
+IMPORT_PROBE = PEAK_RSS + """
+import json, time
+start = time.perf_counter()
+import screen_recorder
+elapsed = time.perf_counter() - start
+heavy = [name for name in ("torch", "customtkinter", "tkinter", "sounddevice", "requests") if name in sys.modules]
+print(json.dumps({"ms": elapsed * 1000, "rss_mb": peak_rss_mb(), "heavy": heavy}))
+"""
+
+WINDOW_PROBE = PEAK_RSS + """
+import json, time
+start = time.perf_counter()
+from recorder_gui import RecorderGUI
+imported = time.perf_counter()
+app = RecorderGUI()
+# Process pending events so the window is mapped and drawn once
+app.window.update()
+painted = time.perf_counter()
+app.window.destroy()
+print(json.dumps({"import_ms": (imported - start) * 1000, "ms": (painted - start) * 1000,
+                  "rss_mb": peak_rss_mb()}))
+"""
+
+
+def run_probe(code):
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"
+    # The recorder prints status lines of its own; the probe's JSON is last
+    return json.loads(result.stdout.strip().splitlines()[-1]), None
+
+
+def measure(code, runs):
+    samples = []
+    for _ in range(runs):
+        sample, error = run_probe(code)
+        if sample is None:
+            return None, error
+        samples.append(sample)
+    return samples, None
+
+
+def format_rss(samples):
+    values = [s["rss_mb"] for s in samples if s["rss_mb"] is not None]
+    return f"peak RSS {max(values):.0f} MB" if values else "peak RSS n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import time exceeds this")
+    parser.add_argument("--max-window-ms", type=float, help="fail if the median time to first window exceeds this")
+    args = parser.parse_args()
+    failed = False
+
+    samples, error = measure(IMPORT_PROBE, args.runs)
+    if samples is None:
+        print(f"import screen_recorder: failed ({error})")
+        return 1
+    import_ms = statistics.median(s["ms"] for s in samples)
+    print(f"import screen_recorder: {import_ms:8.1f} ms median of {args.runs}, {format_rss(samples)}")
+    if samples[0]["heavy"]:
+        print(f"  warning: eagerly imported {', '.join(samples[0]['heavy'])}")
+    if args.max_import_ms and import_ms > args.max_import_ms:
+        print(f"  FAIL: above {args.max_import_ms:.0f} ms")
+        failed = True
+
+    samples, error = measure(WINDOW_PROBE, args.runs)
+    if samples is None:
+        print(f"time to first window: skipped ({error})")
+    else:
+        window_ms = statistics.median(s["ms"] for s in samples)
+        gui_import_ms = statistics.median(s["import_ms"] for s in samples)
+        print(f"time to first window:  {window_ms:8.1f} ms median of {args.runs} "
+              f"(imports {gui_import_ms:.1f} ms), {format_rss(samples)}")
+        if args.max_window_ms and window_ms > args.max_window_ms:
+            print(f"  FAIL: above {args.max_window_ms:.0f} ms")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,594 @@
+import ctypes
+import ctypes.util
+import importlib.util
+import queue
+import sys
+import threading
+
+import cv2
+import numpy as np
+
+
+class CaptureBackend:
+    """Base class for screen-grab backends.
+
+    grab() returns an (height, width, channels) uint8 NumPy view in the
+    backend's native `pixel_format`; to_bgr() converts it to the BGR frames
+    the encoder expects in a single pass.  Views may point straight into a
+    shared buffer that the backend reuses, so a frame is only valid until the
+    backend has produced `buffers` more frames; consumers copy what they keep.
+    """
+
+    name = "base"
+    auto_select = True
+    pixel_format = "BGRA"
+
+    def __init__(self, region=None, buffers=2):
+        self.region = region
+        self.buffers = max(1, int(buffers))
+        self.left = 0
+        self.top = 0
+        self.width = 0
+        self.height = 0
+        self.screen_rect = (0, 0, 0, 0)
+
+    @classmethod
+    def available(cls):
+        return False
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def frame_shape(self):
+        """Shape of the arrays grab() returns."""
+        return self.height, self.width, len(self.pixel_format)
+
+    def open(self):
+        raise NotImplementedError
+
+    def grab(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def move_to(self, left, top):
+        """Move the grab origin, keeping the (fixed) capture size on screen."""
+        screen_left, screen_top, screen_width, screen_height = self.screen_rect
+        self.left = int(min(max(left, screen_left), screen_left + screen_width - self.width))
+        self.top = int(min(max(top, screen_top), screen_top + screen_height - self.height))
+
+    def _apply_region(self, screen_left, screen_top, screen_width, screen_height):
+        self.screen_rect = (screen_left, screen_top, screen_width, screen_height)
+        if self.region:
+            left, top, width, height = self.region
+        else:
+            left, top, width, height = screen_left, screen_top, screen_width, screen_height
+        # Clip to the screen and keep dimensions even, as yuv420p encoders require
+        width = min(int(width), screen_width) & ~1
+        height = min(int(height), screen_height) & ~1
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Capture region {self.region} is empty")
+        self.width, self.height = width, height
+        self.move_to(left, top)
+
+
+# --- X11 MIT-SHM -----------------------------------------------------------
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+class _XImage(ctypes.Structure):
+    # Leading fields of Xlib's XImage; only these are read or written here
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+    ]
+
+
+_ZPIXMAP = 2
+_IPC_PRIVATE = 0
+_IPC_CREAT = 0o1000
+_IPC_RMID = 0
+_ALL_PLANES = ctypes.c_ulong(-1).value
+
+
+def _load_x11():
+    x11_path = ctypes.util.find_library("X11")
+    xext_path = ctypes.util.find_library("Xext")
+    if not x11_path or not xext_path:
+        return None
+    x11 = ctypes.cdll.LoadLibrary(x11_path)
+    xext = ctypes.cdll.LoadLibrary(xext_path)
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+    x11.XOpenDisplay.restype = ctypes.c_void_p
+    x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+    x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+    x11.XRootWindow.restype = ctypes.c_ulong
+    x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDefaultVisual.restype = ctypes.c_void_p
+    x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XFree.argtypes = [ctypes.c_void_p]
+
+    xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+    xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+    xext.XShmCreateImage.argtypes = [
+        ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+        ctypes.c_char_p, ctypes.POINTER(_XShmSegmentInfo), ctypes.c_uint, ctypes.c_uint,
+    ]
+    xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+    xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+    xext.XShmGetImage.argtypes = [
+        ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XImage),
+        ctypes.c_int, ctypes.c_int, ctypes.c_ulong,
+    ]
+
+    libc.shmget.restype = ctypes.c_int
+    libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+    libc.shmat.restype = ctypes.c_void_p
+    libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+    libc.shmdt.argtypes = [ctypes.c_void_p]
+    libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+    return x11, xext, libc
+
+
+class XShmBackend(CaptureBackend):
+    """X11 MIT-SHM grabber: the X server writes straight into shared memory."""
+
+    name = "xshm"
+
+    @classmethod
+    def available(cls):
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            libs = _load_x11()
+        except (OSError, AttributeError):
+            return False
+        if libs is None:
+            return False
+        x11, xext, _ = libs
+        display = x11.XOpenDisplay(None)
+        if not display:
+            return False
+        try:
+            return bool(xext.XShmQueryExtension(display))
+        finally:
+            x11.XCloseDisplay(display)
+
+    def open(self):
+        self._x11, self._xext, self._libc = _load_x11()
+        self._display = self._x11.XOpenDisplay(None)
+        if not self._display:
+            raise RuntimeError("Cannot open X display")
+        screen = self._x11.XDefaultScreen(self._display)
+        self._root = self._x11.XRootWindow(self._display, screen)
+        self._apply_region(0, 0, self._x11.XDisplayWidth(self._display, screen),
+                           self._x11.XDisplayHeight(self._display, screen))
+        visual = self._x11.XDefaultVisual(self._display, screen)
+        depth = self._x11.XDefaultDepth(self._display, screen)
+
+        self._slots = []
+        self._next = 0
+        for _ in range(self.buffers):
+            self._slots.append(self._create_slot(visual, depth))
+
+    def _create_slot(self, visual, depth):
+        info = _XShmSegmentInfo()
+        image = self._xext.XShmCreateImage(self._display, visual, depth, _ZPIXMAP, None,
+                                           ctypes.byref(info), self.width, self.height)
+        if not image:
+            raise RuntimeError("XShmCreateImage failed")
+        if image.contents.bits_per_pixel != 32:
+            raise RuntimeError(f"Unsupported X11 pixel depth: {image.contents.bits_per_pixel}")
+        stride = image.contents.bytes_per_line
+        nbytes = stride * self.height
+        info.shmid = self._libc.shmget(_IPC_PRIVATE, nbytes, _IPC_CREAT | 0o600)
+        if info.shmid < 0:
+            raise OSError(ctypes.get_errno(), "shmget failed")
+        info.shmaddr = self._libc.shmat(info.shmid, None, 0)
+        image.contents.data = info.shmaddr
+        info.readOnly = 0
+        self._xext.XShmAttach(self._display, ctypes.byref(info))
+        self._x11.XSync(self._display, 0)
+        # Segment is freed automatically once both sides detach
+        self._libc.shmctl(info.shmid, _IPC_RMID, None)
+
+        raw = (ctypes.c_ubyte * nbytes).from_address(info.shmaddr)
+        bgra = np.frombuffer(raw, dtype=np.uint8).reshape(self.height, stride)
+        view = bgra[:, :self.width * 4].reshape(self.height, self.width, 4)
+        return image, info, view
+
+    def grab(self):
+        image, _, view = self._slots[self._next]
+        self._next = (self._next + 1) % len(self._slots)
+        self._xext.XShmGetImage(self._display, self._root, image, self.left, self.top, _ALL_PLANES)
+        return view
+
+    def close(self):
+        for image, info, _ in getattr(self, "_slots", []):
+            self._xext.XShmDetach(self._display, ctypes.byref(info))
+            # The shm segment is not Xlib's to free, so release only the XImage struct
+            self._x11.XFree(image)
+            self._libc.shmdt(info.shmaddr)
+        self._slots = []
+        if getattr(self, "_display", None):
+            self._x11.XCloseDisplay(self._display)
+            self._display = None
+
+
+# --- Raw BGRA buffer grabber (mss) ----------------------------------------
+
+class MSSBackend(CaptureBackend):
+    """Wraps the raw BGRA buffer returned by mss without copying it."""
+
+    name = "mss"
+
+    @classmethod
+    def available(cls):
+        return importlib.util.find_spec("mss") is not None
+
+    def open(self):
+        import mss
+        self._sct = None
+        with mss.mss() as sct:
+            # Full screen means the primary monitor; a region may lie on any of them
+            screen = sct.monitors[0] if self.region else sct.monitors[1]
+        self._apply_region(screen["left"], screen["top"], screen["width"], screen["height"])
+
+    def grab(self):
+        # mss handles are bound to the thread that created them
+        if self._sct is None:
+            import mss
+            self._sct = mss.mss()
+        shot = self._sct.grab({"left": self.left, "top": self.top,
+                               "width": self.width, "height": self.height})
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+    def close(self):
+        if getattr(self, "_sct", None) is not None:
+            self._sct.close()
+            self._sct = None
+
+
+# --- pyautogui fallback ---------------------------------------------------
+
+class PyAutoGUIBackend(CaptureBackend):
+    """Portable fallback through pyautogui/PIL; slowest of the real backends."""
+
+    name = "pyautogui"
+    pixel_format = "RGB"
+
+    @classmethod
+    def available(cls):
+        return importlib.util.find_spec("pyautogui") is not None
+
+    def open(self):
+        import pyautogui
+        screen_size = pyautogui.size()
+        self._apply_region(0, 0, screen_size.width, screen_size.height)
+
+    def grab(self):
+        import pyautogui
+        rgb = np.asarray(pyautogui.screenshot(region=(self.left, self.top, self.width, self.height)))
+        # Drop alpha on RGBA platforms; the view still converts as RGB
+        return rgb[:, :, :3]
+
+
+# --- Synthetic test pattern -----------------------------------------------
+
+class SyntheticBackend(CaptureBackend):
+    """Moving test pattern for headless CI and benchmarks; never auto-selected."""
+
+    name = "synthetic"
+    auto_select = False
+
+    def __init__(self, region=None, buffers=2, size=(1920, 1080), screens=None):
+        super().__init__(region, buffers)
+        # screens=[(width, height), ...] lays out several monitors left to right
+        self.screens = screens
+        if screens:
+            size = (sum(width for width, _ in screens), max(height for _, height in screens))
+        self.default_size = size
+        self.frame_index = 0
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def open(self):
+        self._apply_region(0, 0, *self.default_size)
+        x = np.linspace(0, 255, self.width, dtype=np.uint8)
+        y = np.linspace(0, 255, self.height, dtype=np.uint8)
+        base = np.empty((self.height, self.width, 4), dtype=np.uint8)
+        base[:, :, 0] = x[np.newaxis, :]
+        base[:, :, 1] = y[:, np.newaxis]
+        base[:, :, 2] = 128 + (self.left // 16) % 128  # tinted per monitor
+        base[:, :, 3] = 255
+        self._base = base
+        self._slots = [base.copy() for _ in range(self.buffers)]
+        self._bar_pos = [None] * self.buffers
+        self._bar_width = max(1, self.width // 32)
+        self._next = 0
+
+    def grab(self):
+        index = self._next
+        self._next = (self._next + 1) % len(self._slots)
+        slot = self._slots[index]
+
+        # Only repaint the moving bar, not the whole frame
+        old = self._bar_pos[index]
+        if old is not None:
+            slot[:, old:old + self._bar_width] = self._base[:, old:old + self._bar_width]
+        pos = (self.frame_index * 8) % max(1, self.width - self._bar_width)
+        slot[:, pos:pos + self._bar_width, :3] = 255
+        self._bar_pos[index] = pos
+        self.frame_index += 1
+        return slot
+
+
+# --- Multiple monitors ----------------------------------------------------
+
+def get_monitors(name="auto", **options):
+    """Return (left, top, width, height) of each display, primary first."""
+    if name == "synthetic":
+        sizes = options.get("screens") or [options.get("size", (1920, 1080))]
+        rects = []
+        left = 0
+        for width, height in sizes:
+            rects.append((left, 0, width, height))
+            left += width
+        return rects
+    try:
+        import mss
+        with mss.mss() as sct:
+            return [(m["left"], m["top"], m["width"], m["height"]) for m in sct.monitors[1:]]
+    except Exception:
+        pass
+    # Without mss only the backend's own screen is known
+    backend = open_backend(name, buffers=1, **options)
+    try:
+        return [backend.screen_rect]
+    finally:
+        backend.close()
+
+
+class CompositeBackend(CaptureBackend):
+    """Captures several monitors in parallel onto one canvas.
+
+    Each monitor has its own backend and grab thread.  grab() hands every
+    thread the next canvas slot; each grabs its monitor and copies it into
+    its own rectangle of the slot with one vectorised copy, and grab()
+    returns once all have finished.  Backends release the GIL while grabbing
+    and copying, so a frame takes as long as the slowest monitor rather than
+    the sum of all of them.  The canvas covers the monitors' bounding box;
+    areas no monitor covers stay black.
+    """
+
+    name = "composite"
+    auto_select = False
+
+    def __init__(self, monitors, backend="auto", buffers=2, **options):
+        super().__init__(None, buffers)
+        self.monitors = [tuple(int(v) for v in rect) for rect in monitors]
+        self.backend_name = backend
+        self.options = options
+        self.backends = []
+        self._workers = []
+        self._done = queue.SimpleQueue()
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def open(self):
+        left = min(rect[0] for rect in self.monitors)
+        top = min(rect[1] for rect in self.monitors)
+        right = max(rect[0] + rect[2] for rect in self.monitors)
+        bottom = max(rect[1] + rect[3] for rect in self.monitors)
+        self._apply_region(left, top, right - left, bottom - top)
+
+        # The view is copied out before the next grab, so one buffer per monitor is enough
+        for rect in self.monitors:
+            self.backends.append(open_backend(self.backend_name, region=rect, buffers=1, **self.options))
+        formats = {backend.pixel_format for backend in self.backends}
+        if len(formats) != 1:
+            raise RuntimeError(f"Monitors captured in different pixel formats: {formats}")
+        self.pixel_format = formats.pop()
+
+        self._slots = [np.zeros(self.frame_shape, dtype=np.uint8) for _ in range(self.buffers)]
+        self._next = 0
+        for backend in self.backends:
+            # Each monitor's rectangle of the canvas, clipped to the (even-sized) canvas
+            x, y = backend.left - self.left, backend.top - self.top
+            width, height = min(backend.width, self.width - x), min(backend.height, self.height - y)
+            requests = queue.SimpleQueue()
+            thread = threading.Thread(target=self._run_worker,
+                                      args=(backend, requests, (slice(y, y + height), slice(x, x + width))),
+                                      daemon=True, name=f"grab-{backend.left},{backend.top}")
+            thread.start()
+            self._workers.append((thread, requests))
+
+    def _run_worker(self, backend, requests, area):
+        rows, cols = area
+        while True:
+            slot = requests.get()
+            if slot is None:
+                break
+            try:
+                view = backend.grab()
+                np.copyto(slot[rows, cols], view[:rows.stop - rows.start, :cols.stop - cols.start])
+                self._done.put(None)
+            except Exception as e:
+                self._done.put(e)
+
+    def grab(self):
+        slot = self._slots[self._next]
+        self._next = (self._next + 1) % len(self._slots)
+        for _, requests in self._workers:
+            requests.put(slot)
+        error = None
+        for _ in self._workers:
+            result = self._done.get()
+            error = error or result
+        if error is not None:
+            raise error
+        return slot
+
+    def close(self):
+        for _, requests in self._workers:
+            requests.put(None)
+        for thread, _ in self._workers:
+            thread.join(timeout=1.0)
+        self._workers = []
+        for backend in self.backends:
+            backend.close()
+        self.backends = []
+
+
+# --- Pixel format conversion ---------------------------------------------
+
+_TO_BGR = {
+    "BGRA": cv2.COLOR_BGRA2BGR,
+    "RGB": cv2.COLOR_RGB2BGR,
+}
+
+
+def to_bgr(view, pixel_format, out=None):
+    """Convert a grabbed view to a contiguous BGR frame, writing into `out` if given.
+
+    One cv2.cvtColor pass; much cheaper than copying a strided [:, :, :3]
+    slice of a BGRA buffer.
+    """
+    if pixel_format == "BGR":
+        if out is None:
+            return np.ascontiguousarray(view)
+        np.copyto(out, view)
+        return out
+    return cv2.cvtColor(view, _TO_BGR[pixel_format], dst=out)
+
+
+# --- Cursor position -----------------------------------------------------
+
+# Reported when the pointer cannot be read; stays off-frame after any downscale
+NO_CURSOR = (-(1 << 20), -(1 << 20))
+
+
+def get_cursor_locator():
+    """Return a callable giving the pointer's screen (x, y), or None without a display.
+
+    pyautogui is imported here rather than at module load because it needs a
+    display; headless capture nodes record without the cursor instead.
+    """
+    try:
+        import pyautogui
+    except Exception as e:
+        print(f"Cursor position unavailable, recording without cursor: {str(e)}")
+        return None
+    return pyautogui.position
+
+
+# --- Window following -----------------------------------------------------
+
+def get_window_rect(title):
+    """Return (left, top, width, height) of the first window whose title contains `title`.
+
+    Uses pygetwindow (installed with pyautogui; Windows and macOS). Returns
+    None if no such window exists.
+    """
+    try:
+        import pygetwindow
+    except Exception as e:
+        raise RuntimeError(f"Window capture is not supported on this platform: {str(e)}")
+    for window in pygetwindow.getWindowsWithTitle(title):
+        if window.width > 0 and window.height > 0:
+            return window.left, window.top, window.width, window.height
+    return None
+
+
+class WindowFollower:
+    """Polls a window's position and keeps a backend's grab origin on it.
+
+    The capture size stays what it was when recording started, so the
+    encoder is never resized; only the origin follows the window.
+    """
+
+    def __init__(self, backend, title, interval=0.25):
+        self.backend = backend
+        self.title = title
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                rect = get_window_rect(self.title)
+            except Exception as e:
+                print(f"Error following window: {str(e)}")
+                return
+            if rect:
+                self.backend.move_to(rect[0], rect[1])
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+
+
+# Fastest first; "auto" picks the first one that opens successfully
+BACKENDS = [XShmBackend, MSSBackend, PyAutoGUIBackend, SyntheticBackend]
+
+
+def get_available_backends():
+    return [backend.name for backend in BACKENDS if backend.available()]
+
+
+def open_backend(name="auto", region=None, buffers=2, **kwargs):
+    """Open the named capture backend, or the fastest available one for "auto"."""
+    if name == "auto":
+        candidates = [backend for backend in BACKENDS if backend.auto_select]
+    else:
+        candidates = [backend for backend in BACKENDS if backend.name == name]
+        if not candidates:
+            raise ValueError(f"Unknown capture backend: {name}")
+
+    errors = []
+    for backend_cls in candidates:
+        if not backend_cls.available():
+            continue
+        backend = backend_cls(region=region, buffers=buffers, **kwargs)
+        try:
+            backend.open()
+            return backend
+        except Exception as e:
+            errors.append(f"{backend_cls.name}: {e}")
+            backend.close()
+    raise RuntimeError("No capture backend available" + (f" ({'; '.join(errors)})" if errors else ""))
@@ -0,0 +1,51 @@
+import numpy as np
+
+
+class CursorCompositor:
+    """Alpha-blends a BGRA cursor onto BGR frames in integer fixed point.
+
+    The premultiplied cursor colour and the inverse alpha are computed once as
+    uint16 planes, so each frame only needs a multiply-add into a small
+    preallocated scratch buffer and a rounded divide by 255 written back into
+    the frame in place.
+    """
+
+    def __init__(self, cursor_bgra):
+        if cursor_bgra.ndim != 3 or cursor_bgra.shape[2] not in (3, 4):
+            raise ValueError("Cursor image must be BGR or BGRA")
+        h, w = cursor_bgra.shape[:2]
+        if cursor_bgra.shape[2] == 4:
+            alpha = cursor_bgra[:, :, 3:4].astype(np.uint16)
+        else:
+            alpha = np.full((h, w, 1), 255, dtype=np.uint16)
+        self.height = h
+        self.width = w
+        # colour * alpha and (255 - alpha) both fit in uint16, as does their sum
+        self.premultiplied = cursor_bgra[:, :, :3].astype(np.uint16) * alpha
+        self.inverse_alpha = 255 - alpha
+        self._acc = np.empty((h, w, 3), dtype=np.uint16)
+        self._tmp = np.empty((h, w, 3), dtype=np.uint16)
+
+    def composite(self, frame, x, y):
+        """Blend the cursor into frame in place with its top-left corner at (x, y)."""
+        frame_h, frame_w = frame.shape[:2]
+        y1, y2 = max(0, y), min(frame_h, y + self.height)
+        x1, x2 = max(0, x), min(frame_w, x + self.width)
+        if y2 <= y1 or x2 <= x1:
+            return frame
+
+        cy1, cx1 = y1 - y, x1 - x
+        cy2, cx2 = cy1 + (y2 - y1), cx1 + (x2 - x1)
+        region = frame[y1:y2, x1:x2]
+        acc = self._acc[:y2 - y1, :x2 - x1]
+        tmp = self._tmp[:y2 - y1, :x2 - x1]
+
+        np.multiply(region, self.inverse_alpha[cy1:cy2, cx1:cx2], out=acc)
+        np.add(acc, self.premultiplied[cy1:cy2, cx1:cx2], out=acc)
+        # Rounded division by 255: (v + 128 + ((v + 128) >> 8)) >> 8
+        np.add(acc, 128, out=acc)
+        np.right_shift(acc, 8, out=tmp)
+        np.add(acc, tmp, out=acc)
+        np.right_shift(acc, 8, out=acc)
+        np.copyto(region, acc, casting='unsafe')
+        return frame
@@ -0,0 +1,216 @@
+import shutil
+import socket
+import subprocess
+import threading
+from collections import deque
+
+# Output size below which a bitrate estimate would mostly measure the container header
+MIN_BITRATE_BYTES = 64 * 1024
+
+# Crash-safe containers: playable up to the last flushed fragment if ffmpeg never writes a trailer
+STREAMABLE_CONTAINERS = {"fmp4": ".mp4", "mkv": ".mkv"}
+
+
+def ffmpeg_available():
+    return shutil.which("ffmpeg") is not None
+
+
+def audio_track_args(input_index, channels, tracks=1):
+    """ffmpeg -map arguments for an audio input holding `tracks` tracks side by side.
+
+    With several tracks the input's channels are split evenly, in order,
+    into that many output audio streams.
+    """
+    if tracks <= 1:
+        return ['-map', f'{input_index}:a']
+    per_track = channels // tracks
+    layout = {1: "mono", 2: "stereo"}.get(per_track, f"{per_track}c")
+    graph = [f"[{input_index}:a]asplit={tracks}" + "".join(f"[s{track}]" for track in range(tracks))]
+    maps = []
+    for track in range(tracks):
+        routes = "|".join(f"c{c}=c{track * per_track + c}" for c in range(per_track))
+        graph.append(f"[s{track}]pan={layout}|{routes}[a{track}]")
+        maps += ['-map', f'[a{track}]']
+    return ['-filter_complex', ";".join(graph)] + maps
+
+
+class _AudioSocketSink:
+    """Audio sink that streams raw float32 samples to ffmpeg over loopback TCP.
+
+    A TCP socket is used rather than a FIFO so the same code works on Windows.
+    ffmpeg connects as a client once it opens its audio input.
+    """
+
+    def __init__(self, connect_timeout=10.0):
+        self.connect_timeout = connect_timeout
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.bind(("127.0.0.1", 0))
+        self._server.listen(1)
+        self.port = self._server.getsockname()[1]
+        self._conn = None
+        self._connected = threading.Event()
+        self._failed = False
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"tcp://127.0.0.1:{self.port}"
+
+    def _accept(self):
+        self._server.settimeout(self.connect_timeout)
+        try:
+            self._conn, _ = self._server.accept()
+        except OSError as e:
+            print(f"ffmpeg did not connect for audio: {str(e)}")
+            self._failed = True
+        finally:
+            self._server.close()
+            self._connected.set()
+
+    def write(self, data):
+        if not self._connected.wait(self.connect_timeout) or self._conn is None:
+            return
+        try:
+            self._conn.sendall(data.tobytes())
+        except OSError as e:
+            if not self._failed:
+                print(f"Error sending audio to ffmpeg: {str(e)}")
+            self._failed = True
+
+    def close(self):
+        if self._conn is not None:
+            try:
+                self._conn.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+            self._conn.close()
+            self._conn = None
+        else:
+            self._server.close()
+
+
+class FFmpegPipeWriter:
+    """Muxes raw BGR frames (stdin) and float32 audio (socket) with one ffmpeg process.
+
+    Exposes the subset of the cv2.VideoWriter interface the recorder uses
+    (write/release/isOpened), so the final file is produced while recording
+    and release() only has to close the pipes.
+
+    container "fmp4" (fragmented MP4) or "mkv" writes a keyframe and a
+    flushed fragment every fragment_seconds, so the file stays playable up
+    to the last fragment even if the process is killed.
+    """
+
+    def __init__(self, path, width, height, fps=30.0, audio_samplerate=None, audio_channels=None,
+                 video_codec="libx264", preset="veryfast", crf=23, audio_codec="aac", audio_tracks=1,
+                 container="mp4", fragment_seconds=1.0):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.audio_samplerate = audio_samplerate
+        self.audio_channels = audio_channels
+        self.audio_tracks = audio_tracks  # audio_channels are split evenly into this many tracks
+        self.video_codec = video_codec
+        self.preset = preset
+        self.crf = crf
+        self.audio_codec = audio_codec
+        self.container = container
+        self.fragment_seconds = fragment_seconds
+        self.audio_sink = None
+        self.process = None
+        self._stderr_tail = deque(maxlen=20)
+        self.bitrate = None  # bits per second of encoded output, from ffmpeg's progress reports
+
+    def _build_command(self):
+        # Inputs are raw and fully described, so skip probing: ffmpeg opens its
+        # inputs one after another and would otherwise stall before connecting for audio
+        no_probe = ['-probesize', '32', '-analyzeduration', '0', '-thread_queue_size', '64']
+        command = [
+            'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', '-progress', 'pipe:1',
+        ] + no_probe + [
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+            '-s', f"{self.width}x{self.height}", '-framerate', str(self.fps),
+            '-i', 'pipe:0',
+        ]
+        if self.audio_sink:
+            command += no_probe + [
+                '-f', 'f32le', '-ar', str(self.audio_samplerate), '-ac', str(self.audio_channels),
+                '-i', self.audio_sink.url,
+                '-map', '0:v',
+            ] + audio_track_args(1, self.audio_channels, self.audio_tracks) + [
+                '-c:a', self.audio_codec,
+            ]
+        command += [
+            '-c:v', self.video_codec, '-preset', self.preset, '-crf', str(self.crf),
+            '-pix_fmt', 'yuv420p',
+        ]
+        if self.container in STREAMABLE_CONTAINERS:
+            # Every fragment starts on a keyframe and is on disk once written
+            command += ['-g', str(max(1, int(round(self.fps * self.fragment_seconds)))), '-flush_packets', '1']
+            if self.container == "fmp4":
+                command += ['-f', 'mp4', '-movflags', '+frag_keyframe+empty_moov+delay_moov+default_base_moof']
+            else:
+                command += ['-f', 'matroska', '-cluster_time_limit', str(int(self.fragment_seconds * 1000))]
+        command.append(self.path)
+        return command
+
+    def open(self):
+        if self.audio_samplerate and self.audio_channels:
+            self.audio_sink = _AudioSocketSink()
+        self.process = subprocess.Popen(
+            self._build_command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+        threading.Thread(target=self._read_progress, daemon=True).start()
+        return self
+
+    def _read_progress(self):
+        # key=value blocks about twice a second; bitrate is derived from size and media time.
+        # The muxer flushes in large chunks, so sizes below that are mostly header.
+        total_size = None
+        for line in iter(self.process.stdout.readline, b''):
+            key, _, value = line.decode(errors="replace").strip().partition("=")
+            if key == "total_size" and value.isdigit():
+                total_size = int(value)
+            elif key == "out_time_us" and value.isdigit() and total_size and int(value) > 0:
+                if total_size >= MIN_BITRATE_BYTES:
+                    self.bitrate = total_size * 8 / (int(value) / 1e6)
+
+    def _read_stderr(self):
+        for line in iter(self.process.stderr.readline, b''):
+            self._stderr_tail.append(line.decode(errors="replace").rstrip())
+
+    def isOpened(self):
+        return self.process is not None and self.process.poll() is None
+
+    def write(self, frame):
+        try:
+            self.process.stdin.write(frame.data)
+        except (BrokenPipeError, OSError) as e:
+            raise RuntimeError(f"ffmpeg pipe closed: {self.last_error() or str(e)}")
+
+    def release(self, timeout=30.0):
+        """Close both pipes and wait for ffmpeg to write the trailer."""
+        if self.process is None:
+            return False
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        if self.audio_sink:
+            self.audio_sink.close()
+        try:
+            returncode = self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            returncode = self.process.wait()
+        if returncode != 0:
+            print(f"FFmpeg error: {self.last_error()}")
+        return returncode == 0
+
+    def last_error(self):
+        return "\n".join(self._stderr_tail)
@@ -0,0 +1,398 @@
+import os
+import re
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from ffmpeg_writer import audio_track_args, ffmpeg_available
+
+# Files a recording leaves in the output directory until it is finalized
+SEGMENT_FILE = re.compile(r"^(?P<base>.+)_(?P<kind>chunk|part|gop)(?P<index>\d+)(?P<ext>\.mp4|\.mkv|\.wav)$")
+
+
+class SegmentFinalizer:
+    """Finalizes finished recording segments on one background worker.
+
+    Jobs run in submission order, so segments are finished in the order they
+    were recorded while capture carries on into the next segment.  Jobs
+    check `cancelled` to skip their muxing once finalization is cancelled.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="finalize")
+        self.futures = []
+        self.cancelled = threading.Event()
+
+    def submit(self, func, *args, **kwargs):
+        future = self._executor.submit(func, *args, **kwargs)
+        self.futures.append(future)
+        return future
+
+    def results(self, progress=None):
+        """Wait for every submitted job and return their results in order.
+
+        progress, if given, is called with (done, total) as each job finishes.
+        """
+        results = []
+        for future in self.futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"Error finalizing segment: {str(e)}")
+                traceback.print_exc()
+                results.append(None)
+            if progress:
+                progress(len(results), len(self.futures))
+        return results
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+class FinalizeJob:
+    """One stopped recording's finalization, as seen from other threads.
+
+    status goes queued -> running -> done, failed or cancelled; progress
+    runs from 0 to 1.  cancel() skips the steps that have not started yet:
+    writers are still closed, but segments are not muxed or joined and stay
+    in place for `recover`.
+    """
+
+    def __init__(self, name, func, cancel_event=None):
+        self.name = name
+        self.func = func
+        self.status = "queued"
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.cancel_event = cancel_event or threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def wait(self, timeout=None):
+        """Block until the job has finished; returns False on timeout."""
+        return self._done.wait(timeout)
+
+    def run(self):
+        self.status = "running"
+        try:
+            # Runs even when cancelled while queued, so the writers still get closed
+            self.result = self.func(self)
+            self.status = "cancelled" if self.cancelled else "done"
+        except Exception as e:
+            print(f"Error finalizing {self.name}: {str(e)}")
+            traceback.print_exc()
+            self.error = str(e)
+            self.status = "failed"
+        finally:
+            self.progress = 1.0
+            self._done.set()
+
+
+class FinalizeQueue:
+    """Runs FinalizeJobs one at a time on a background thread, in the order submitted.
+
+    Recordings are finalized in the order they were stopped while the
+    recorder is free to start the next one.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="finalize-jobs")
+        self.jobs = []
+
+    def submit(self, name, func, cancel_event=None):
+        """Queue func(job) and return its FinalizeJob."""
+        job = FinalizeJob(name, func, cancel_event)
+        self.jobs.append(job)
+        self._executor.submit(job.run)
+        return job
+
+    def pending(self):
+        """Jobs that are queued or running."""
+        self.jobs = [job for job in self.jobs if not job.done]
+        return list(self.jobs)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def finalize_segment(writer, video_path, audio_path=None, audio_done=None, output_path=None, audio_tracks=1,
+                     cancelled=None):
+    """Close a finished segment and mux its audio in if it was recorded separately.
+
+    Returns the path of the playable segment file.  If `cancelled` is set the
+    writer is still closed but nothing is muxed.
+    """
+    if audio_done is not None and not audio_done.wait(timeout=30.0):
+        print(f"Timed out waiting for audio of {video_path}")
+    writer.release()
+    if output_path and not (cancelled and cancelled.is_set()):
+        return mux_segment(video_path, audio_path, output_path, audio_tracks)
+    return video_path
+
+
+def finish_process_encoder(encoder, video_path, audio_path, output_path, audio_tracks=1, cancelled=None):
+    """Wait for a ProcessEncoder's workers, join their segments and mux in the audio.
+
+    Returns the path of the playable recording, the list of worker segments
+    if they could not be joined, or None.
+    """
+    # Worker segments each start on a keyframe, so they join without re-encoding
+    gop_paths = encoder.finish()
+    print(f"Encode workers finished {len(gop_paths)} segment(s)")
+    if not gop_paths or (cancelled and cancelled.is_set()):
+        return None
+    video_path = concat_segments(gop_paths, video_path) if ffmpeg_available() else None
+    if video_path is None:
+        print("Keeping per-process segments as they are")
+        return gop_paths
+    return mux_segment(video_path, audio_path, output_path, audio_tracks)
+
+
+def mux_segment(video_path, audio_path, output_path, audio_tracks=1):
+    """Mux a video file with its WAV track, keeping the inputs if anything fails.
+
+    With audio_tracks > 1 the WAV holds that many tracks side by side, and
+    each becomes its own audio stream.
+    """
+    if not os.path.exists(video_path):
+        print(f"Video file not found: {video_path}")
+        return None
+    if not ffmpeg_available():
+        print("ffmpeg not found. Skipping audio-video combination.")
+        return video_path
+
+    if audio_path and os.path.exists(audio_path) and audio_tracks > 1:
+        import soundfile as sf
+        command = [
+            'ffmpeg', '-y',
+            '-i', video_path,
+            '-i', audio_path,
+            '-map', '0:v',
+        ] + audio_track_args(1, sf.info(audio_path).channels, audio_tracks) + [
+            '-c:v', 'copy',
+            '-c:a', 'aac',
+            output_path
+        ]
+    elif audio_path and os.path.exists(audio_path):
+        command = [
+            'ffmpeg', '-y',
+            '-i', video_path,
+            '-i', audio_path,
+            '-c:v', 'copy',
+            '-c:a', 'aac',
+            output_path
+        ]
+    else:
+        command = [
+            'ffmpeg', '-y',
+            '-i', video_path,
+            '-c:v', 'copy',
+            output_path
+        ]
+
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0 or not os.path.exists(output_path):
+        print(f"FFmpeg error: {result.stderr}")
+        return video_path  # Keep original video if ffmpeg fails
+
+    # Clean up temporary files only if combining was successful
+    try:
+        os.remove(video_path)
+        if audio_path and os.path.exists(audio_path):
+            os.remove(audio_path)
+    except Exception as e:
+        print(f"Error cleaning up temporary files: {str(e)}")
+    return output_path
+
+
+def concat_segments(segment_paths, output_path):
+    """Join finished segments with ffmpeg's concat demuxer (stream copy, no re-encode).
+
+    Returns output_path, or None if the segments were left as they are.
+    """
+    segment_paths = [path for path in segment_paths if path and os.path.exists(path)]
+    if not segment_paths:
+        return None
+    if len(segment_paths) == 1:
+        os.replace(segment_paths[0], output_path)
+        return output_path
+    if not ffmpeg_available():
+        print("ffmpeg not found. Keeping individual segments.")
+        return None
+
+    list_fd, list_path = tempfile.mkstemp(suffix=".txt", dir=os.path.dirname(output_path))
+    try:
+        with os.fdopen(list_fd, 'w', encoding='utf-8') as f:
+            for path in segment_paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        command = [
+            'ffmpeg', '-y',
+            '-f', 'concat', '-safe', '0',
+            '-i', list_path,
+            '-map', '0',  # every stream, including all audio tracks
+            '-c', 'copy',
+            output_path
+        ]
+        result = subprocess.run(command, capture_output=True, text=True)
+    finally:
+        os.remove(list_path)
+
+    if result.returncode != 0 or not os.path.exists(output_path):
+        print(f"FFmpeg concat error: {result.stderr}")
+        return None
+
+    for path in segment_paths:
+        try:
+            os.remove(path)
+        except Exception as e:
+            print(f"Error removing segment {path}: {str(e)}")
+    return output_path
+
+
+def repair_wav(path):
+    """Fix the RIFF and data chunk sizes of a WAV file whose writer was never closed.
+
+    Returns True if the header was rewritten.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'r+b') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+            return False
+        position = 12
+        while position + 8 <= size:
+            f.seek(position)
+            chunk_id, chunk_size = struct.unpack('<4sI', f.read(8))
+            if chunk_id == b'data':
+                actual = size - position - 8
+                if chunk_size == actual:
+                    return False
+                f.seek(position + 4)
+                f.write(struct.pack('<I', actual))
+                f.seek(4)
+                f.write(struct.pack('<I', size - 8))
+                return True
+            # Chunks are padded to an even size
+            position += 8 + chunk_size + (chunk_size & 1)
+    return False
+
+
+def salvage_segment(video_path, audio_path, output_path):
+    """Remux whatever is readable of an interrupted segment.
+
+    Fragmented MP4 and Matroska segments keep every fragment flushed before
+    the interruption; a regular MP4 whose index was never written cannot be
+    read at all.  Returns output_path, or None with the inputs left in place.
+    """
+    command = ['ffmpeg', '-y', '-v', 'error', '-i', video_path]
+    if audio_path and os.path.exists(audio_path):
+        repair_wav(audio_path)
+        command += ['-i', audio_path, '-map', '0:v', '-map', '1:a', '-c:v', 'copy', '-c:a', 'aac']
+    else:
+        command += ['-map', '0', '-c', 'copy']
+    result = subprocess.run(command + [output_path], capture_output=True, text=True)
+    if result.returncode != 0 or not os.path.exists(output_path):
+        reason = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "no output"
+        print(f"Could not salvage {video_path} ({reason}); leaving it{' and its audio' if audio_path else ''} in place")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return None
+    for path in (video_path, audio_path):
+        if path and os.path.exists(path):
+            os.remove(path)
+    return output_path
+
+
+def _readable(path):
+    result = subprocess.run(['ffmpeg', '-v', 'error', '-i', path, '-map', '0', '-c', 'copy', '-f', 'null', '-'],
+                            capture_output=True, text=True)
+    return result.returncode == 0
+
+
+def _recover_recording(directory, base, files):
+    by_kind = {}
+    for kind, index, ext, path in sorted(files):
+        by_kind.setdefault((kind, ext == ".wav"), {})[index] = path
+    parts = by_kind.get(("part", False), {})
+    videos = by_kind.get(("chunk", False), {})
+    audio = by_kind.get(("chunk", True), {})
+    gops = by_kind.get(("gop", False), {})
+
+    if gops and 0 not in videos:
+        # Process encoding: finished GOP files are complete, the one being written is not
+        readable = [path for _, path in sorted(gops.items()) if _readable(path)]
+        for path in sorted(set(gops.values()) - set(readable)):
+            print(f"Could not read {path}; leaving it in place")
+        video_path = os.path.join(directory, f"{base}_chunk0.mp4")
+        if concat_segments(readable, video_path):
+            videos[0] = video_path
+
+    segments = []
+    for index in sorted(set(parts) | set(videos) | set(audio)):
+        if index in parts:
+            segments.append(parts[index])
+        elif index in videos:
+            extension = os.path.splitext(videos[index])[1]
+            output_path = os.path.join(directory, f"{base}_part{index}{extension}")
+            segments.append(salvage_segment(videos[index], audio.get(index), output_path))
+        else:
+            repair_wav(audio[index])
+            print(f"No video for {audio[index]}; keeping the audio")
+    segments = [path for path in segments if path]
+    if not segments:
+        return None
+    extension = os.path.splitext(segments[0])[1]
+    return concat_segments(segments, os.path.join(directory, f"{base}_recovered{extension}"))
+
+
+def recover_recordings(directory, min_age=10.0):
+    """Salvage the segment files of recordings that never stopped cleanly.
+
+    Leftover _chunk, _part and _gop files are grouped by recording, every
+    readable segment is remuxed with its audio and the segments are joined
+    into <name>_recovered.mp4 (or .mkv).  Files modified within min_age
+    seconds are assumed to belong to a recording still running and are left
+    alone.  Returns the recovered file paths.
+    """
+    if not ffmpeg_available():
+        print("ffmpeg not found. Cannot recover recordings.")
+        return []
+    recordings = {}
+    for name in os.listdir(directory):
+        match = SEGMENT_FILE.match(name)
+        if match:
+            recordings.setdefault(match['base'], []).append(
+                (match['kind'], int(match['index']), match['ext'], os.path.join(directory, name)))
+
+    recovered = []
+    now = time.time()
+    for base, files in sorted(recordings.items()):
+        if any(now - os.path.getmtime(path) < min_age for *_, path in files):
+            print(f"Skipping {base}: still being written")
+            continue
+        try:
+            path = _recover_recording(directory, base, files)
+        except Exception as e:
+            print(f"Error recovering {base}: {str(e)}")
+            traceback.print_exc()
+            continue
+        if path:
+            print(f"Recovered {path}")
+            recovered.append(path)
+    return recovered
@@ -0,0 +1,353 @@
+import bisect
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+QUEUE_POLICIES = ("drop_oldest", "block")
+
+# Stages timed by ScreenRecorder, in pipeline order
+PIPELINE_STAGES = ("grab", "convert", "cursor", "encode", "preview")
+
+# Upper bounds of the stage latency histogram buckets, in milliseconds (plus +Inf)
+STAGE_BUCKETS_MS = (1, 2, 5, 10, 20, 33, 50, 100, 250, 500, 1000)
+
+# Output heights for the named resolution presets
+OUTPUT_PRESETS = {
+    "native": None,
+    "1440p": 1440,
+    "1080p": 1080,
+    "720p": 720,
+    "480p": 480,
+}
+
+
+class QueueClosed(Exception):
+    """Raised by FrameQueue.get once the queue is closed and drained."""
+
+
+class FrameQueue:
+    """Bounded hand-off queue between two pipeline stages.
+
+    With the "drop_oldest" policy a full queue discards its oldest item so the
+    producer never waits; with "block" the producer waits for free space
+    (backpressure) until the queue is closed.
+    """
+
+    def __init__(self, maxsize=4, policy="drop_oldest", name="queue"):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.name = name
+        self.dropped = 0
+        self.on_drop = None
+        self._items = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        """Add an item, returning False if it could not be queued."""
+        dropped_item = None
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._items) >= self.maxsize:
+                if self.policy == "drop_oldest":
+                    dropped_item = self._items.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._items) >= self.maxsize and not self._closed:
+                        self._cond.wait(0.1)
+                    if self._closed:
+                        return False
+            self._items.append(item)
+            self._cond.notify_all()
+        if dropped_item is not None and self.on_drop:
+            self.on_drop(dropped_item)
+        return True
+
+    def get(self, timeout=None):
+        """Remove and return the oldest item.
+
+        Raises QueueClosed once the queue is closed and empty, or
+        TimeoutError if nothing arrived within timeout seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._items:
+                if self._closed:
+                    raise QueueClosed(self.name)
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(self.name)
+                self._cond.wait(remaining)
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        """Stop accepting items; consumers drain what is left, then see QueueClosed."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class FrameScheduler:
+    """Paces frame grabs against a monotonic clock.
+
+    Deadlines are derived from the start time and a frame index, so a slow
+    frame never pushes the rest of the schedule back.  Slots that were missed
+    entirely are skipped and counted in `late`.  Paused time is excluded from
+    the timestamps handed out.  pause() and resume() may be called from any
+    thread; they and the slot arithmetic share one lock, so a resume never
+    lands between reading the pause offset and booking missed slots.
+    """
+
+    def __init__(self, fps, clock=time.monotonic):
+        self.fps = fps
+        self.interval = 1.0 / fps
+        self.clock = clock
+        self.start_time = None
+        self.index = 0
+        self.late = 0
+        self.paused_total = 0.0
+        self.resumed_at = None  # clock time the current unpaused run began
+        self._pause_start = None
+        self._lock = threading.Lock()
+
+    def start(self, start_time=None):
+        """Start the schedule now, or at an earlier reading of `clock` shared with other schedulers."""
+        with self._lock:
+            self.start_time = self.clock() if start_time is None else start_time
+            self.resumed_at = self.start_time
+            self.index = 0
+            self.late = 0
+            self.paused_total = 0.0
+            self._pause_start = None
+
+    def wait(self):
+        """Sleep until the next frame slot is due."""
+        with self._lock:
+            target = self.start_time + self.paused_total + self.index * self.interval
+            now = self.clock()
+            if now >= target:
+                missed = int((now - target) / self.interval)
+                if missed:
+                    self.late += missed
+                    self.index += missed
+            self.index += 1
+        # Sleep outside the lock so pause() and resume() never wait on a frame
+        if now < target:
+            time.sleep(target - now)
+
+    def timestamp(self):
+        """Media time in seconds since start, excluding paused time."""
+        return self.media_time(self.clock())
+
+    def media_time(self, clock_time):
+        """Media time of a reading of `clock`, e.g. an audio block's capture time."""
+        with self._lock:
+            return clock_time - self.start_time - self.paused_total
+
+    @property
+    def paused(self):
+        return self._pause_start is not None
+
+    def pause(self):
+        with self._lock:
+            if self._pause_start is None:
+                self._pause_start = self.clock()
+
+    def resume(self):
+        """Leave the paused state; returns how long the pause lasted."""
+        with self._lock:
+            if self._pause_start is None:
+                return 0.0
+            self.resumed_at = self.clock()
+            paused_for = self.resumed_at - self._pause_start
+            self.paused_total += paused_for
+            self._pause_start = None
+            return paused_for
+
+
+def downscale(frame, size, out=None):
+    """Resize a frame of any packed pixel format (BGR, BGRA, ...) to size=(width, height) with INTER_AREA.
+
+    Large frames are first decimated with a strided view so INTER_AREA only
+    has to average over a few source pixels per output pixel.
+    """
+    width, height = size
+    stride = max(1, min(frame.shape[1] // width, frame.shape[0] // height) // 2)
+    source = frame[::stride, ::stride] if stride > 1 else frame
+    if out is None:
+        return cv2.resize(source, (width, height), interpolation=cv2.INTER_AREA)
+    return cv2.resize(source, (width, height), dst=out, interpolation=cv2.INTER_AREA)
+
+
+def downscale_for_encode(frame, size, out=None):
+    """Resize a grabbed frame to the encoded size=(width, height).
+
+    From a 2x reduction down this is downscale(), which does not alias.
+    Above that INTER_LINEAR's 2x2 neighbourhood still reaches every source
+    pixel, and it avoids INTER_AREA's slow non-integer path (about 40 ms a
+    frame for 4K to 1440p).
+    """
+    if frame.shape[1] >= 2 * size[0] and frame.shape[0] >= 2 * size[1]:
+        return downscale(frame, size, out)
+    return cv2.resize(frame, size, dst=out, interpolation=cv2.INTER_LINEAR)
+
+
+def resolve_output_size(setting, source_size):
+    """Work out the encoded (width, height) for an output resolution setting.
+
+    setting is a preset name from OUTPUT_PRESETS, a (width, height) tuple or
+    a float scale factor.  Presets keep the source aspect ratio and never
+    upscale; sizes are rounded down to even numbers for yuv420p encoders.
+    """
+    source_width, source_height = source_size
+    if setting is None or setting == "native":
+        return source_width, source_height
+    if isinstance(setting, str):
+        if setting not in OUTPUT_PRESETS:
+            raise ValueError(f"Unknown output resolution: {setting}")
+        target_height = min(OUTPUT_PRESETS[setting], source_height)
+        width = source_width * target_height / source_height
+        height = target_height
+    elif isinstance(setting, (int, float)):
+        if setting <= 0:
+            raise ValueError(f"Invalid output scale: {setting}")
+        scale = min(float(setting), 1.0)
+        width, height = source_width * scale, source_height * scale
+    else:
+        width, height = setting
+    return max(2, int(round(width)) & ~1), max(2, int(round(height)) & ~1)
+
+
+class FramePool:
+    """Recycles fixed-shape frame buffers between pipeline stages.
+
+    Buffers are reference counted: acquire() hands one out with a count of
+    one, retain() adds a holder (e.g. the preview) and release() returns it
+    to the free list once nobody holds it.  When the free list is empty a
+    new buffer is allocated and counted as a miss; up to `size` buffers are
+    kept for reuse.
+    """
+
+    def __init__(self, shape, size=8, dtype=np.uint8):
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._free = []
+        self._refs = {}
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._free:
+                buffer = self._free.pop()
+                self.hits += 1
+            else:
+                buffer = np.empty(self.shape, dtype=self.dtype)
+                self.misses += 1
+            self._refs[id(buffer)] = [buffer, 1]
+        return buffer
+
+    def retain(self, buffer):
+        with self._lock:
+            entry = self._refs.get(id(buffer))
+            if entry is not None:
+                entry[1] += 1
+
+    def release(self, buffer):
+        """Drop one reference; buffers that did not come from this pool are ignored."""
+        if buffer is None:
+            return
+        with self._lock:
+            entry = self._refs.get(id(buffer))
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._refs[id(buffer)]
+                if len(self._free) < self.size:
+                    self._free.append(buffer)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'free': len(self._free),
+                'in_use': len(self._refs),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+class StageTimer:
+    """Per-call durations of one pipeline stage.
+
+    Keeps running totals and a latency histogram (STAGE_BUCKETS_MS) for the
+    whole recording, plus the most recent `window` samples for rolling
+    percentiles.  Each stage records from its own thread while others read
+    summaries, hence the lock.
+    """
+
+    def __init__(self, window=1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._bounds = [bound / 1000 for bound in STAGE_BUCKETS_MS]
+        self._buckets = [0] * (len(self._bounds) + 1)
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+            self._buckets[bisect.bisect_left(self._bounds, seconds)] += 1
+            self._samples.append(seconds)
+
+    def summary(self):
+        """Count, total, mean/p50/p95/p99/max in milliseconds and per-bucket counts.
+
+        Percentiles cover the rolling window; everything else the whole
+        recording.  `buckets` lines up with STAGE_BUCKETS_MS, the last entry
+        counting calls slower than the largest bound.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total, peak = self.count, self.total, self.max
+            buckets = list(self._buckets)
+        if not samples:
+            return {'count': 0, 'total_s': 0.0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0,
+                    'max_ms': 0.0, 'buckets': buckets}
+
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+
+        return {
+            'count': count,
+            'total_s': total,
+            'mean_ms': total / count * 1000,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'max_ms': peak * 1000,
+            'buckets': buckets,
+        }
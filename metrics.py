@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import traceback
+
+from frame_pipeline import STAGE_BUCKETS_MS
+
+
+def format_prometheus(metrics, prefix="screen_recorder"):
+    """Render a ScreenRecorder.get_metrics() snapshot in Prometheus text format."""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for labels, value in samples:
+            if value is None:
+                continue
+            label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+            lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if label_text
+                         else f"{prefix}_{name} {value}")
+
+    metric("recording", "gauge", "1 while a recording is running.",
+           [({}, int(metrics['recording']))])
+    metric("elapsed_seconds", "gauge", "Seconds since the recording started.",
+           [({}, metrics['elapsed_s'])])
+    metric("frames_total", "counter", "Output frames by outcome.",
+           [({'kind': kind}, value) for kind, value in metrics['frames'].items()])
+    metric("queue_depth", "gauge", "Items waiting in each pipeline queue.",
+           [({'queue': name}, depth) for name, depth in metrics['queues'].items()])
+    metric("audio_events_total", "counter", "Audio overflows, underflows and ring buffer overruns.",
+           [({'kind': kind}, metrics['audio'][kind])
+            for kind in ("input_overflows", "input_underflows", "overruns")])
+    metric("audio_buffered_frames", "gauge", "Audio frames waiting to be written.",
+           [({}, metrics['audio']['buffered_frames'])])
+    sync = metrics.get('sync', {})
+    metric("av_start_offset_seconds", "gauge", "Media time at which each stream's first sample was captured.",
+           [({'stream': stream}, None if sync.get(f'{key}_ms') is None else sync[f'{key}_ms'] / 1000)
+            for stream, key in (("video", "video_start_offset"), ("audio", "start_offset"))])
+    metric("audio_drift_ppm", "gauge", "Measured audio clock rate against the capture clock.",
+           [({}, sync.get('drift_ppm'))])
+    metric("audio_sync_corrections_total", "counter", "Audio samples padded or trimmed to stay on media time.",
+           [({'kind': kind}, sync.get(f'{kind}_frames')) for kind in ("padded", "trimmed")])
+    metric("audio_stretched_samples", "gauge", "Net samples removed (negative: added) by drift correction.",
+           [({}, sync.get('stretched_frames'))])
+    metric("output_bitrate_bps", "gauge", "Average output bitrate; the current segment while recording, the whole file once stopped.",
+           [({}, metrics['encoder']['bitrate_bps'])])
+
+    # Histograms carry cumulative bucket counts plus _sum and _count
+    name = f"{prefix}_stage_seconds"
+    lines.append(f"# HELP {name} Time spent per frame in each pipeline stage.")
+    lines.append(f"# TYPE {name} histogram")
+    for stage, summary in metrics['stages'].items():
+        cumulative = 0
+        for bound, count in zip(STAGE_BUCKETS_MS, summary['buckets']):
+            cumulative += count
+            lines.append(f'{name}_bucket{{stage="{stage}",le="{bound / 1000:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {summary["count"]}')
+        lines.append(f'{name}_sum{{stage="{stage}"}} {summary["total_s"]}')
+        lines.append(f'{name}_count{{stage="{stage}"}} {summary["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """Writes a metrics snapshot to a file every `interval` seconds.
+
+    JSON by default; paths ending in .prom get Prometheus text format, e.g.
+    for node_exporter's textfile collector.  Each write goes to a temporary
+    file that is then renamed over the target, so readers never see a
+    partial snapshot.
+    """
+
+    def __init__(self, source, path, interval=5.0):
+        self.source = source
+        self.path = path
+        self.interval = interval
+        self.prometheus = path.endswith(".prom")
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def write_once(self):
+        metrics = self.source()
+        if self.prometheus:
+            text = format_prometheus(metrics)
+        else:
+            text = json.dumps(metrics, indent=2)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(text)
+        os.replace(temp_path, self.path)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.write_once()
+            except Exception as e:
+                print(f"Error writing metrics: {str(e)}")
+                traceback.print_exc()
+
+    def stop(self):
+        """Stop the periodic writes and write one final snapshot."""
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=self.interval + 1.0)
+        try:
+            self.write_once()
+        except Exception as e:
+            print(f"Error writing metrics: {str(e)}")
+            traceback.print_exc()
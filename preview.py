@@ -0,0 +1,95 @@
+import threading
+import time
+import traceback
+
+import cv2
+import numpy as np
+
+from frame_pipeline import downscale
+
+
+class PreviewMailbox:
+    """Single-slot hand-off where the newest frame always replaces the old one."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._item = None
+
+    def put(self, item):
+        """Store item and return the one it displaced, if any."""
+        with self._lock:
+            old, self._item = self._item, item
+        return old
+
+    def take(self):
+        with self._lock:
+            item, self._item = self._item, None
+        return item
+
+
+class PreviewStage:
+    """Produces small RGB preview frames at a low, fixed rate off the capture path.
+
+    The encoder only drops frames into the mailbox; this thread wakes up
+    preview_fps times a second, downsamples the newest one and hands it to
+    the callback.  The callback runs on this thread, so GUI callbacks should
+    just store the frame and let their own main loop draw it.  If `release`
+    is given it is called with every submitted frame once the preview is done
+    with it, so pooled buffers can be recycled.
+    """
+
+    _TO_RGB = {
+        "BGR": cv2.COLOR_BGR2RGB,
+        "BGRA": cv2.COLOR_BGRA2RGB,
+        "RGB": None,
+    }
+
+    def __init__(self, callback, size=(640, 360), fps=10.0, release=None, timer=None):
+        self.callback = callback
+        self.release = release
+        self.timer = timer
+        self.size = size
+        self.interval = 1.0 / fps
+        self.mailbox = PreviewMailbox()
+        self._small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, frame, pixel_format="BGR"):
+        displaced = self.mailbox.put((frame, pixel_format))
+        if displaced is not None and self.release:
+            self.release(displaced[0])
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            item = self.mailbox.take()
+            if item is None:
+                continue
+            frame, pixel_format = item
+            started = time.perf_counter()
+            try:
+                small = downscale(frame, self.size, out=self._small if frame.shape[2] == 3 else None)
+            finally:
+                if self.release:
+                    self.release(frame)
+            try:
+                # A fresh array per delivery so the consumer may keep it
+                code = self._TO_RGB[pixel_format]
+                rgb = cv2.cvtColor(small, code) if code is not None else small
+                self.callback(rgb)
+                if self.timer:
+                    self.timer.record(time.perf_counter() - started)
+            except Exception as e:
+                print(f"Preview callback error: {str(e)}")
+                traceback.print_exc()
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        item = self.mailbox.take()
+        if item is not None and self.release:
+            self.release(item[0])
@@ -0,0 +1,192 @@
+import multiprocessing
+import queue
+import traceback
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from capture_backends import to_bgr
+from cursor_compositor import CursorCompositor
+from frame_pipeline import downscale_for_encode
+
+
+def _encode_worker(jobs, free_slots, results, shm_name, ring_shape, pixel_format, fps, out_size,
+                   cursor_image, fourcc):
+    """Worker process: converts frames out of shared memory and encodes its segments."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        ring = np.ndarray(ring_shape, dtype=np.uint8, buffer=shm.buf)
+        compositor = CursorCompositor(cursor_image) if cursor_image is not None else None
+        source_size = (ring_shape[2], ring_shape[1])
+        scale_x = out_size[0] / source_size[0]
+        scale_y = out_size[1] / source_size[1]
+        writer = None
+        segment = None
+        path = None
+        last = None
+        # Two output buffers in turn, so `last` survives while the next frame is built
+        frames = [np.empty((out_size[1], out_size[0], 3), dtype=np.uint8) for _ in range(2)]
+        turn = 0
+        scratch = None
+
+        while True:
+            job = jobs.get()
+            kind = job[0]
+            if kind == "open":
+                _, segment, path = job
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, out_size)
+                last = None
+            elif kind == "frame":
+                _, slot, x, y, gap = job
+                view = ring[slot]
+                if source_size != out_size:
+                    scratch = downscale_for_encode(view, out_size, out=scratch)
+                    frame = to_bgr(scratch, pixel_format, out=frames[turn])
+                    x, y = int(x * scale_x), int(y * scale_y)
+                else:
+                    frame = to_bgr(view, pixel_format, out=frames[turn])
+                frames[turn] = frame
+                turn ^= 1
+                # The slot can be reused as soon as the frame is out of shared memory
+                free_slots.put(slot)
+                if compositor and 0 <= x < out_size[0] and 0 <= y < out_size[1]:
+                    compositor.composite(frame, x, y)
+                # Fill capture gaps with the previous frame (or this one at a segment start)
+                for _ in range(gap):
+                    writer.write(last if last is not None else frame)
+                writer.write(frame)
+                last = frame
+            elif kind == "close" and writer is not None:
+                writer.release()
+                results.put((segment, path))
+                writer = None
+            elif kind == "stop":
+                break
+    except Exception as e:
+        print(f"Error in encode worker: {str(e)}")
+        traceback.print_exc()
+    finally:
+        if writer is not None:
+            writer.release()
+            results.put((segment, path))
+        shm.close()
+
+
+class ProcessEncoder:
+    """Encodes a recording across worker processes in GOP-aligned segments.
+
+    Captured frames are copied, still in the backend's pixel_format, into a
+    ring of slots in one multiprocessing.shared_memory block.  Output frame n belongs to segment
+    n // gop_frames, and segments are dealt round-robin to the workers, so
+    when encoding falls behind real time several segments are converted and
+    encoded in parallel.  Each segment is its own file starting on a
+    keyframe, so they can be joined in order without re-encoding.
+    """
+
+    def __init__(self, workers, frame_shape, output_pattern, fps=30.0, out_size=None,
+                 cursor_image=None, gop_frames=60, slots=None, fourcc='XVID', block_timeout=None,
+                 pixel_format="BGR"):
+        self.workers = max(1, int(workers))
+        self.frame_shape = tuple(frame_shape)
+        self.pixel_format = pixel_format
+        self.output_pattern = output_pattern
+        self.fps = fps
+        self.out_size = out_size or (frame_shape[1], frame_shape[0])
+        self.cursor_image = cursor_image
+        self.gop_frames = max(1, int(gop_frames))
+        self.slots = slots or self.workers * 8
+        self.fourcc = fourcc
+        # How long submit() may wait for a free slot before dropping the frame
+        self.block_timeout = block_timeout if block_timeout is not None else 1.0 / fps
+        self.next_index = 0
+        self.current_segment = None
+        self.segments_opened = 0
+        self.dropped = 0
+        self.duplicated = 0
+        self._shm = None
+        self._processes = []
+        self._jobs = []
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        ring_shape = (self.slots,) + self.frame_shape
+        self._shm = shared_memory.SharedMemory(create=True, size=int(np.prod(ring_shape)))
+        self.ring = np.ndarray(ring_shape, dtype=np.uint8, buffer=self._shm.buf)
+        self._free_slots = context.Queue()
+        for slot in range(self.slots):
+            self._free_slots.put(slot)
+        self._results = context.Queue()
+        for _ in range(self.workers):
+            jobs = context.Queue()
+            process = context.Process(
+                target=_encode_worker,
+                args=(jobs, self._free_slots, self._results, self._shm.name, ring_shape,
+                      self.pixel_format, self.fps, self.out_size, self.cursor_image, self.fourcc),
+                daemon=True
+            )
+            process.start()
+            self._jobs.append(jobs)
+            self._processes.append(process)
+        return self
+
+    def _worker_for(self, segment):
+        return self._jobs[segment % self.workers]
+
+    def submit(self, view, x, y, pts):
+        """Queue one captured frame stamped with pts; returns False if it was dropped."""
+        index = int(round(pts * self.fps))
+        if index < self.next_index:
+            self.dropped += 1
+            return False
+        try:
+            slot = self._free_slots.get(timeout=self.block_timeout)
+        except queue.Empty:
+            # Every slot is waiting on a busy worker
+            self.dropped += 1
+            return False
+        np.copyto(self.ring[slot], view)
+
+        segment = self.next_index // self.gop_frames
+        if segment != self.current_segment:
+            if self.current_segment is not None:
+                self._worker_for(self.current_segment).put(("close",))
+            self._worker_for(segment).put(("open", segment, self.output_pattern.format(segment)))
+            self.current_segment = segment
+            self.segments_opened += 1
+
+        gap = index - self.next_index
+        self.duplicated += gap
+        self._worker_for(segment).put(("frame", slot, x, y, gap))
+        self.next_index = index + 1
+        return True
+
+    def finish(self, timeout=60.0):
+        """Close the last segment, stop the workers and return segment paths in order."""
+        if self.current_segment is not None:
+            self._worker_for(self.current_segment).put(("close",))
+        for jobs in self._jobs:
+            jobs.put(("stop",))
+
+        finished = {}
+        while len(finished) < self.segments_opened:
+            try:
+                segment, path = self._results.get(timeout=timeout)
+            except queue.Empty:
+                print("Timed out waiting for encode workers")
+                break
+            finished[segment] = path
+
+        for process in self._processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+        self.close()
+        return [finished[segment] for segment in sorted(finished)]
+
+    def close(self):
+        if self._shm is not None:
+            self.ring = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
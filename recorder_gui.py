@@ -0,0 +1,714 @@
+import os
+import threading
+import time
+import traceback
+
+import customtkinter as ctk
+import numpy as np
+import tkinter as tk
+
+from screen_recorder import ScreenRecorder
+from version_control import VersionControl, get_version
+
+METER_INTERVAL_MS = 50  # level meter refresh, independent of the audio block rate
+
+
+class RecorderGUI:
+    def __init__(self):
+        self.recorder = ScreenRecorder()
+        self.version_control = VersionControl()
+        
+        self.window = ctk.CTk()
+        self.window.title(f"Screen Recorder v{get_version()}")
+        self.window.geometry("1200x700")
+        self.window.resizable(False, False)
+        
+        # Configure grid weights
+        self.window.grid_columnconfigure(0, weight=1)
+        self.window.grid_columnconfigure(1, weight=0)  # Control panel
+        self.window.grid_rowconfigure(0, weight=1)
+        
+        # Create main frame for preview
+        self.preview_frame = ctk.CTkFrame(self.window)
+        self.preview_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        
+        # Create preview canvas with fixed size
+        self.preview_canvas = ctk.CTkCanvas(
+            self.preview_frame,
+            width=640,
+            height=360,
+            bg='black'
+        )
+        self.preview_canvas.pack(expand=True, padx=10, pady=10)
+        
+        # One PhotoImage is reused for every preview update
+        self.preview_photo = tk.PhotoImage(master=self.window, width=640, height=360)
+        self.preview_canvas.create_image(320, 180, image=self.preview_photo, anchor="center")
+        self.pending_preview = None
+        self.recorder.set_preview_callback(self.update_preview)
+        self.window.after(100, self.refresh_preview)
+        
+        # Create control panel frame with fixed width
+        self.control_panel = ctk.CTkFrame(self.window, width=300)
+        self.control_panel.grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
+        self.control_panel.grid_propagate(False)  # Prevent frame from shrinking
+        
+        # Theme toggle
+        self.theme_button = ctk.CTkButton(
+            self.control_panel,
+            text="Toggle Theme",
+            command=self.toggle_theme
+        )
+        self.theme_button.pack(pady=5)
+        
+        # Cursor selection
+        self.cursor_frame = ctk.CTkFrame(self.control_panel)
+        self.cursor_frame.pack(fill="x", padx=5, pady=5)
+        
+        self.cursor_label = ctk.CTkLabel(
+            self.cursor_frame,
+            text="Select Cursor:"
+        )
+        self.cursor_label.pack(pady=(5, 0))
+        
+        # Filled in by the background device scan once the window is up
+        self.available_cursors = ["default"]
+        self.cursor_var = ctk.StringVar(value="default")
+        self.cursor_menu = ctk.CTkOptionMenu(
+            self.cursor_frame,
+            values=self.available_cursors,
+            variable=self.cursor_var,
+            command=self.on_cursor_select,
+            width=200
+        )
+        self.cursor_menu.pack(pady=5)
+        
+        # Custom cursor upload button
+        self.upload_cursor_button = ctk.CTkButton(
+            self.cursor_frame,
+            text="Upload Custom Cursor",
+            command=self.upload_custom_cursor
+        )
+        self.upload_cursor_button.pack(pady=5)
+        
+        # Capture area selection
+        self.capture_var = ctk.StringVar(value="Full Screen")
+        self.capture_menu = ctk.CTkOptionMenu(
+            self.cursor_frame,
+            values=["Full Screen", "All Monitors", "Each Monitor (separate files)", "Select Region...", "Follow Window..."],
+            variable=self.capture_var,
+            command=self.on_capture_area_select,
+            width=200
+        )
+        self.capture_menu.pack(pady=5)
+        
+        # Microphone selection frame
+        self.mic_frame = ctk.CTkFrame(self.control_panel)
+        self.mic_frame.pack(fill="x", padx=5, pady=5)
+        
+        self.mic_label = ctk.CTkLabel(
+            self.mic_frame,
+            text="Select Microphone:"
+        )
+        self.mic_label.pack(pady=(5, 0))
+        
+        # Microphones are enumerated in the background after the first paint
+        self.available_mics = []
+        self.mic_names = []
+        self.mic_var = ctk.StringVar(value="Loading microphones...")
+        self.mic_menu = ctk.CTkOptionMenu(
+            self.mic_frame,
+            values=["Loading microphones..."],
+            variable=self.mic_var,
+            command=self.on_mic_select,
+            width=200
+        )
+        self.mic_menu.pack(pady=5)
+        
+        # A second input mixed with the mic, typically a loopback device for system audio
+        self.system_audio_label = ctk.CTkLabel(
+            self.mic_frame,
+            text="System Audio:"
+        )
+        self.system_audio_label.pack(pady=(5, 0))
+        
+        self.system_audio_var = ctk.StringVar(value="None")
+        self.system_audio_menu = ctk.CTkOptionMenu(
+            self.mic_frame,
+            values=["None"],
+            variable=self.system_audio_var,
+            command=self.on_system_audio_select,
+            width=200
+        )
+        self.system_audio_menu.pack(pady=5)
+        
+        # Filename input
+        self.filename_label = ctk.CTkLabel(
+            self.control_panel,
+            text="Recording Name:"
+        )
+        self.filename_label.pack(pady=(10, 0))
+        
+        self.filename_entry = ctk.CTkEntry(
+            self.control_panel,
+            width=200
+        )
+        self.filename_entry.pack(pady=(5, 20))
+        
+        # Recording status frame
+        self.status_frame = ctk.CTkFrame(self.control_panel)
+        self.status_frame.pack(fill="x", padx=5, pady=5)
+        
+        # Recording indicator light
+        self.indicator_canvas = ctk.CTkCanvas(
+            self.status_frame,
+            width=20,
+            height=20,
+            bg=self.window._apply_appearance_mode(ctk.ThemeManager.theme["CTkFrame"]["fg_color"]),
+            highlightthickness=0
+        )
+        self.indicator_canvas.pack(side="left", padx=5)
+        self.indicator_light = self.indicator_canvas.create_oval(5, 5, 15, 15, fill="gray")
+        
+        # Timer label
+        self.timer_label = ctk.CTkLabel(
+            self.status_frame,
+            text="00:00:00",
+            font=("Arial", 16)
+        )
+        self.timer_label.pack(side="left", padx=10)
+        
+        # Optional live pipeline stats under the timer
+        self.show_stats_var = ctk.BooleanVar(value=False)
+        self.show_stats_checkbox = ctk.CTkCheckBox(
+            self.status_frame,
+            text="Stats",
+            variable=self.show_stats_var,
+            command=self.update_stats_label,
+            width=60
+        )
+        self.show_stats_checkbox.pack(side="right", padx=5)
+        
+        self.stats_label = ctk.CTkLabel(
+            self.control_panel,
+            text="",
+            font=("Arial", 11),
+            justify="left"
+        )
+        self.stats_label.pack(fill="x", padx=5)
+        
+        # Volume meter
+        self.volume_frame = ctk.CTkFrame(self.control_panel)
+        self.volume_frame.pack(fill="x", padx=5, pady=10)
+        
+        self.volume_label = ctk.CTkLabel(
+            self.volume_frame,
+            text="Volume Level"
+        )
+        self.volume_label.pack()
+        
+        # One bar per channel: RMS solid, peak lighter behind it, peak hold as a tick
+        self.meter_width = 180
+        channels = self.recorder.audio_channels
+        self.meter_canvas = ctk.CTkCanvas(
+            self.volume_frame,
+            width=self.meter_width,
+            height=channels * 14 + 2,
+            bg="#2b2b2b",
+            highlightthickness=0
+        )
+        self.meter_canvas.pack(pady=5)
+        self.meter_bars = []
+        for channel in range(channels):
+            top = 2 + channel * 14
+            self.meter_bars.append((
+                self.meter_canvas.create_rectangle(0, top, 0, top + 10, fill="#7bc67e", width=0),
+                self.meter_canvas.create_rectangle(0, top, 0, top + 10, fill="green", width=0),
+                self.meter_canvas.create_line(0, top, 0, top + 10, fill="yellow", width=2),
+                top
+            ))
+        self.monitoring = False
+        self.window.after(METER_INTERVAL_MS, self.refresh_meter)
+        
+        # Test Audio Button
+        self.test_audio_button = ctk.CTkButton(
+            self.volume_frame,
+            text="Monitor",
+            command=self.test_microphone,
+            width=120
+        )
+        self.test_audio_button.pack(pady=5)
+        
+        # Start/Stop button
+        self.start_button = ctk.CTkButton(
+            self.control_panel,
+            text="Start Recording",
+            command=self.toggle_recording
+        )
+        self.start_button.pack(pady=20)
+        
+        # Pause/Resume button
+        self.pause_button = ctk.CTkButton(
+            self.control_panel,
+            text="Pause",
+            command=self.pause_resume_recording,
+            state="disabled"
+        )
+        self.pause_button.pack(pady=5)
+        
+        self.status_label = ctk.CTkLabel(
+            self.control_panel,
+            text="Ready to record"
+        )
+        self.status_label.pack(pady=10)
+        
+        # Recordings frame (right side)
+        self.list_frame = ctk.CTkFrame(self.window)
+        self.list_frame.grid(row=0, column=2, padx=5, pady=5, sticky="nsew")
+        
+        self.list_label = ctk.CTkLabel(
+            self.list_frame,
+            text="Last Recording:",
+            font=("Arial", 14, "bold")
+        )
+        self.list_label.pack(pady=5)
+        
+        # Frame for the last recording
+        self.last_recording_frame = ctk.CTkFrame(self.list_frame)
+        self.last_recording_frame.pack(fill="x", padx=5, pady=5)
+        
+        # Label for the last recording (will be updated)
+        self.last_recording_label = ctk.CTkLabel(
+            self.last_recording_frame,
+            text="No recordings yet",
+            wraplength=200
+        )
+        self.last_recording_label.pack(pady=5)
+        
+        # Recordings still being finalized in the background
+        self.finalize_label = ctk.CTkLabel(
+            self.last_recording_frame,
+            text="",
+            wraplength=200
+        )
+        self.finalize_label.pack(pady=(0, 5))
+        
+        self.cancel_finalize_button = ctk.CTkButton(
+            self.last_recording_frame,
+            text="Cancel Finalizing",
+            command=self.cancel_finalizing,
+            state="disabled"
+        )
+        self.cancel_finalize_button.pack(pady=(0, 5))
+        self.finalize_polling = False
+        
+        # Buttons frame
+        self.buttons_frame = ctk.CTkFrame(self.list_frame)
+        self.buttons_frame.pack(fill="x", padx=5, pady=5)
+        
+        # Open last recording button
+        self.open_recording_button = ctk.CTkButton(
+            self.buttons_frame,
+            text="Open Recording",
+            command=self.open_last_recording,
+            state="disabled"
+        )
+        self.open_recording_button.pack(side="left", padx=2, pady=5)
+        
+        # Open folder button
+        self.open_folder_button = ctk.CTkButton(
+            self.buttons_frame,
+            text="Open Folder",
+            command=self.open_recordings_folder
+        )
+        self.open_folder_button.pack(side="right", padx=2, pady=5)
+        
+        # Add version control to the control panel
+        self.version_frame = ctk.CTkFrame(self.control_panel)
+        self.version_frame.pack(fill="x", padx=5, pady=5)
+        
+        self.version_label = ctk.CTkLabel(
+            self.version_frame,
+            text=f"Version: {get_version()}"
+        )
+        self.version_label.pack(side="left", padx=5)
+        
+        self.check_updates_button = ctk.CTkButton(
+            self.version_frame,
+            text="Check Updates",
+            command=lambda: self.check_for_updates(force=True),
+            width=100
+        )
+        self.check_updates_button.pack(side="right", padx=5)
+        
+        # Check for updates on startup; usually answered from the on-disk cache
+        self.update_check = None
+        self.window.after(1000, self.check_for_updates)
+        
+        # Device enumeration (PortAudio init, cursor folder) waits until the window is up
+        self.device_scan = None
+        self.window.after(100, self.start_device_scan)
+        
+        self.recording_active = False
+        self.start_time = None
+
+
+    def update_timer(self):
+        if self.recording_active and self.start_time:
+            try:
+                elapsed = time.time() - self.start_time - self.recorder.total_pause_duration
+                hours = int(elapsed // 3600)
+                minutes = int((elapsed % 3600) // 60)
+                seconds = int(elapsed % 60)
+                self.timer_label.configure(text=f"{hours:02d}:{minutes:02d}:{seconds:02d}")
+                self.update_stats_label()
+                if self.recording_active:  # Only schedule next update if still recording
+                    self.window.after(1000, self.update_timer)
+            except Exception as e:
+                print(f"Error updating timer: {str(e)}")
+
+    def update_stats_label(self):
+        if not self.show_stats_var.get() or not self.recorder.recording or self.recorder.record_started is None:
+            self.stats_label.configure(text="")
+            return
+        metrics = self.recorder.get_metrics()
+        frames = metrics['frames']
+        queues = metrics['queues']
+        p95 = "/".join(f"{metrics['stages'][stage]['p95_ms']:.1f}" for stage in ("grab", "convert", "encode"))
+        bitrate = metrics['encoder']['bitrate_bps']
+        audio = metrics['audio']
+        self.stats_label.configure(text=(
+            f"Frames {frames['written']}  dropped {frames['dropped']}  late {frames['late']}\n"
+            f"Queues capture {queues['capture']}  encode {queues['encode']}\n"
+            f"p95 grab/convert/encode {p95} ms\n"
+            f"Audio overflows {audio['input_overflows'] + audio['overruns']}  "
+            f"Bitrate {f'{bitrate / 1000:.0f} kbps' if bitrate else '-'}"
+        ))
+
+    def refresh_meter(self):
+        # The audio callback only accumulates levels; they are read here at the UI rate
+        meter = self.recorder.audio_meter
+        peak, rms, hold = meter.read()
+        for channel, (peak_bar, rms_bar, hold_tick, top) in enumerate(self.meter_bars[:meter.channels]):
+            self.meter_canvas.coords(peak_bar, 0, top, meter.fraction(peak[channel]) * self.meter_width, top + 10)
+            self.meter_canvas.coords(rms_bar, 0, top, meter.fraction(rms[channel]) * self.meter_width, top + 10)
+            x = meter.fraction(hold[channel]) * self.meter_width
+            self.meter_canvas.coords(hold_tick, x, top, x, top + 10)
+            self.meter_canvas.itemconfig(hold_tick, fill="red" if hold[channel] >= 1.0 else "yellow")
+        self.window.after(METER_INTERVAL_MS, self.refresh_meter)
+
+    def start_device_scan(self):
+        self.device_scan = {}
+        threading.Thread(target=self._scan_devices, args=(self.device_scan,), daemon=True).start()
+        self.window.after(50, self.apply_device_scan)
+
+    def _scan_devices(self, result):
+        # Runs off the Tk thread; apply_device_scan picks the result up
+        try:
+            result['cursors'] = self.recorder.get_available_cursors()
+            result['mics'] = self.recorder.get_available_mics()
+        except Exception as e:
+            print(f"Error enumerating devices: {str(e)}")
+            traceback.print_exc()
+            result.setdefault('mics', [])
+        result['done'] = True
+
+    def apply_device_scan(self):
+        if not self.device_scan.get('done'):
+            self.window.after(50, self.apply_device_scan)
+            return
+        
+        if self.device_scan.get('cursors'):
+            self.available_cursors = self.device_scan['cursors']
+            self.cursor_menu.configure(values=self.available_cursors)
+        
+        self.available_mics = self.device_scan['mics']
+        self.mic_names = [f"{mic['name']}{' (Default)' if mic['default'] else ''}" for mic in self.available_mics]
+        self.mic_menu.configure(values=self.mic_names)
+        self.mic_var.set(self.mic_names[0] if self.mic_names else "No microphones found")
+        self.system_audio_menu.configure(values=["None"] + self.mic_names)
+        
+        # Set initial microphone
+        if self.available_mics:
+            default_mic = next((mic for mic in self.available_mics if mic['default']), self.available_mics[0])
+            self.recorder.set_microphone(default_mic['id'])
+            self.mic_var.set(self.mic_names[self.available_mics.index(default_mic)])
+
+    def on_mic_select(self, choice):
+        if choice not in self.mic_names:
+            return
+        selected_index = self.mic_names.index(choice)
+        selected_mic = self.available_mics[selected_index]
+        self.recorder.set_microphone(selected_mic['id'])
+        print(f"Selected microphone: {selected_mic['name']} (ID: {selected_mic['id']})")
+
+    def on_system_audio_select(self, choice):
+        if choice not in self.mic_names:
+            self.recorder.audio_sources = []
+            return
+        device = self.available_mics[self.mic_names.index(choice)]
+        self.recorder.audio_sources = [{"device": device['id'], "name": "system"}]
+        print(f"Recording system audio from: {device['name']} (ID: {device['id']})")
+
+    def on_cursor_select(self, choice):
+        self.recorder.load_cursor(choice)
+
+    def on_capture_area_select(self, choice):
+        try:
+            if choice == "Select Region...":
+                region = self.recorder.select_region_interactive()
+                if region:
+                    self.capture_var.set(f"Region {region[2]}x{region[3]} at {region[0]},{region[1]}")
+                    return
+            elif choice == "Follow Window...":
+                dialog = ctk.CTkInputDialog(text="Window title contains:", title="Follow Window")
+                title = dialog.get_input()
+                if title:
+                    self.recorder.set_capture_window(title.strip())
+                    self.capture_var.set(f"Window: {title.strip()}")
+                    return
+            elif choice == "All Monitors":
+                self.recorder.set_capture_monitors("all", "composite")
+                return
+            elif choice == "Each Monitor (separate files)":
+                self.recorder.set_capture_monitors("all", "separate")
+                return
+        except Exception as e:
+            print(f"Error selecting capture area: {str(e)}")
+            traceback.print_exc()
+        # Anything cancelled or failed falls back to full screen
+        self.recorder.set_capture_region(None)
+        self.capture_var.set("Full Screen")
+
+    def test_microphone(self):
+        if not self.monitoring:
+            try:
+                self.recorder.start_monitor()
+            except Exception as e:
+                print(f"Audio test error: {e}")
+                self.status_label.configure(text="Microphone unavailable")
+                return
+            self.monitoring = True
+            self.test_audio_button.configure(text="Stop Monitoring")
+        else:
+            self.stop_mic_test()
+
+    def stop_mic_test(self):
+        self.recorder.stop_monitor()
+        self.monitoring = False
+        self.test_audio_button.configure(text="Monitor")
+
+    def toggle_recording(self):
+        try:
+            if not self.recording_active:
+                # Get filename from entry
+                filename = self.filename_entry.get().strip()
+                if filename:
+                    self.recorder.custom_filename = filename
+                
+                # The recording takes over the microphone and keeps the meter going
+                if self.monitoring:
+                    self.stop_mic_test()
+                
+                # Start recording
+                self.recorder.start_recording()
+                self.recording_active = True  # Set recording active state
+                
+                # Update UI
+                self.start_button.configure(text="Stop Recording")
+                self.pause_button.configure(state="normal")
+                self.status_label.configure(text="Recording...")
+                self.indicator_canvas.itemconfig(self.indicator_light, fill="red")
+                
+                # Start timer
+                self.start_time = time.time()
+                self.window.after(0, self.update_timer)  # Start timer immediately
+                
+                # Update recording list
+                self.update_last_recording()
+                
+            else:
+                # Stop recording; muxing and joining carry on in the background
+                self.recording_active = False  # Set recording inactive first
+                self.recorder.stop_recording(wait=False)
+                
+                # Update UI
+                self.start_button.configure(text="Start Recording")
+                self.pause_button.configure(state="disabled")
+                self.status_label.configure(text="Ready to record")
+                self.indicator_canvas.itemconfig(self.indicator_light, fill="gray")
+                
+                # Reset timer
+                self.timer_label.configure(text="00:00:00")
+                self.start_time = None
+                self.update_stats_label()
+                
+                # The recording list updates once finalizing is done
+                if not self.finalize_polling:
+                    self.finalize_polling = True
+                    self.poll_finalize_jobs()
+                
+        except Exception as e:
+            print(f"Error in toggle_recording: {str(e)}")
+            traceback.print_exc()
+            # Try to cleanup in case of error
+            self.recording_active = False
+            self.start_button.configure(text="Start Recording")
+            self.pause_button.configure(state="disabled")
+            self.status_label.configure(text="Error occurred")
+            self.indicator_canvas.itemconfig(self.indicator_light, fill="gray")
+
+    def toggle_theme(self):
+        if self.current_theme == "dark":
+            ctk.set_appearance_mode("light")
+            self.current_theme = "light"
+        else:
+            ctk.set_appearance_mode("dark")
+            self.current_theme = "dark"
+
+    def upload_custom_cursor(self):
+        from tkinter import filedialog
+        file_path = filedialog.askopenfilename(
+            filetypes=[("PNG files", "*.png")]
+        )
+        if file_path:
+            cursor_name = os.path.splitext(os.path.basename(file_path))[0]
+            new_path = os.path.join(self.recorder.cursor_dir, f"{cursor_name}.png")
+            import shutil
+            shutil.copy2(file_path, new_path)
+            
+            # Refresh cursor list
+            self.available_cursors = self.recorder.get_available_cursors()
+            self.cursor_menu.configure(values=self.available_cursors)
+            self.cursor_var.set(cursor_name)
+            self.recorder.load_cursor(cursor_name)
+
+    def update_preview(self, frame):
+        # Called from the preview thread: only hand the frame over, never touch Tk here
+        self.pending_preview = frame
+
+    def refresh_preview(self):
+        frame, self.pending_preview = self.pending_preview, None
+        if frame is not None and isinstance(frame, np.ndarray):
+            try:
+                # Binary PPM is the one raw RGB format Tk's PhotoImage loads without PIL
+                height, width = frame.shape[:2]
+                ppm = f"P6 {width} {height} 255\n".encode() + frame.tobytes()
+                self.preview_photo.configure(data=ppm, format="PPM")
+            except Exception as e:
+                print(f"Preview update error: {str(e)}")
+                traceback.print_exc()
+        self.window.after(int(1000 / self.recorder.preview_fps), self.refresh_preview)
+
+    def update_last_recording(self):
+        if self.recorder.last_recording:
+            self.last_recording_label.configure(text=self.recorder.last_recording)
+            self.open_recording_button.configure(state="normal")
+
+    def poll_finalize_jobs(self):
+        pending = self.recorder.finalize_queue.pending()
+        if pending:
+            self.finalize_label.configure(text="\n".join(
+                f"Finalizing {job.name}: {job.progress:.0%}{' (cancelling)' if job.cancelled else ''}"
+                for job in pending))
+            self.cancel_finalize_button.configure(state="normal")
+            self.window.after(200, self.poll_finalize_jobs)
+            return
+        self.finalize_polling = False
+        self.finalize_label.configure(text="")
+        self.cancel_finalize_button.configure(state="disabled")
+        self.update_last_recording()
+
+    def cancel_finalizing(self):
+        # Unfinished segments stay in the recordings folder for 'recover'
+        for job in self.recorder.finalize_queue.pending():
+            job.cancel()
+
+    def open_last_recording(self):
+        if self.recorder.last_recording:
+            import os
+            os.startfile(self.recorder.last_recording)
+
+    def open_recordings_folder(self):
+        import os
+        os.startfile(self.recorder.output_dir)
+
+    def pause_resume_recording(self):
+        if self.recorder.paused:
+            self.recorder.resume_recording()
+            self.pause_button.configure(text="Pause")
+        else:
+            self.recorder.pause_recording()
+            self.pause_button.configure(text="Resume")
+
+    def check_for_updates(self, force=False):
+        """Check for updates in the background; prompts once the result is in."""
+        if self.update_check and not self.update_check.done():
+            return
+        self.update_check = self.version_control.check_for_updates_async(force=force)
+        self.check_updates_button.configure(state="disabled")
+        self.window.after(200, self.poll_update_check)
+
+    def poll_update_check(self):
+        if not self.update_check.done():
+            self.window.after(200, self.poll_update_check)
+            return
+        self.check_updates_button.configure(state="normal")
+        if self.update_check.result():
+            update_info = self.version_control.get_update_info()
+            response = ctk.CTkMessagebox(
+                title="Update Available",
+                message=f"A new version ({update_info['latest_version']}) is available.\nWould you like to update now?",
+                icon="info",
+                option_1="Yes",
+                option_2="No"
+            )
+            
+            if response.get() == "Yes":
+                # Download off the Tk thread; progress shows in the status line
+                self.update_progress = None
+                self.update_download = self.version_control.download_update_async(progress=self.on_update_progress)
+                self.check_updates_button.configure(state="disabled")
+                self.window.after(200, self.poll_update_download)
+
+    def on_update_progress(self, done, total):
+        # Called from the download worker: only store it
+        self.update_progress = (done, total)
+
+    def poll_update_download(self):
+        if not self.update_download.done():
+            if self.update_progress and not self.recording_active:
+                done, total = self.update_progress
+                text = f"{done * 100 // total}%" if total else f"{done / 1e6:.1f} MB"
+                self.status_label.configure(text=f"Downloading update... {text}")
+            self.window.after(200, self.poll_update_download)
+            return
+        self.check_updates_button.configure(state="normal")
+        success, message = self.update_download.result()
+        if not self.recording_active:
+            self.status_label.configure(text="Ready to record")
+        if not success:
+            ctk.CTkMessagebox(
+                title="Update Failed",
+                message=message,
+                icon="error"
+            )
+        elif self.version_control.restart_needed and self.version_control.restart_after_update:
+            self.restart_when_idle()
+
+    def restart_when_idle(self):
+        # Restarting mid-recording would lose it, so wait until it is stopped and finalized
+        if self.recording_active or self.recorder.finalize_queue.pending():
+            self.version_label.configure(text=f"Version: {self.version_control.current_version} (restarts after this recording)")
+            self.window.after(1000, self.restart_when_idle)
+            return
+        self.version_control.restart()
+
+
+def main():
+    app = RecorderGUI()
+    app.window.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,25 @@
+import argparse
+import copy
+import functools
 import cv2
 import numpy as np
-import pyautogui
 import threading
 import time
 import os
-import sounddevice as sd
-import soundfile as sf
 from datetime import datetime
-import customtkinter as ctk
-from PIL import Image
-import queue
-import torch
-import subprocess
 import traceback
-from version_control import VersionControl, get_version
+from frame_pipeline import (OUTPUT_PRESETS, PIPELINE_STAGES, FramePool, FrameQueue, FrameScheduler, QueueClosed,
+                            StageTimer, downscale_for_encode, resolve_output_size)
+from capture_backends import (BACKENDS, NO_CURSOR, CompositeBackend, WindowFollower, get_cursor_locator,
+                              get_monitors, get_window_rect, open_backend, to_bgr)
+from cursor_compositor import CursorCompositor
+from preview import PreviewStage
+from audio_sink import AudioMeter, AudioMixer, AudioRingBuffer, AudioSource, StreamingAudioWriter, SyntheticAudioStream
+from ffmpeg_writer import MIN_BITRATE_BYTES, STREAMABLE_CONTAINERS, FFmpegPipeWriter, ffmpeg_available
+from finalize import (FinalizeQueue, SegmentFinalizer, concat_segments, finalize_segment, finish_process_encoder,
+                      recover_recordings)
+from process_encoder import ProcessEncoder
+from metrics import MetricsExporter
 
 class ScreenRecorder:
     def __init__(self):
@@ -23,15 +29,87 @@ class ScreenRecorder:
         self.current_chunk = 0
         self.custom_filename = None
         self.preview_callback = None
-        self.volume_callback = None
+        self.preview_stage = None
+        self.preview_fps = 10.0
+        self.preview_size = (640, 360)
         self.screen_thread = None
+        self.convert_thread = None
+        self.encode_thread = None
+        self.capture_queue = None
+        self.encode_queue = None
+        self.queue_depth = 4
+        self.queue_policy = "drop_oldest"  # or "block" for backpressure
+        self.frame_pool = None
+        self.frame_pool_size = None  # None sizes the pool to cover every in-flight frame
+        self._convert_scratch = None
+        self.capture_backend = "auto"  # or "xshm", "mss", "pyautogui", "synthetic"
+        self.capture_backend_options = {}  # extra backend arguments, e.g. {"size": (3840, 2160)} for synthetic
+        self.backend = None
+        self.capture_region = None  # (left, top, width, height), None for full screen
+        self.capture_window = None  # title of a window to follow
+        self.capture_monitors = None  # "all" or monitor indexes to record several displays at once
+        self.monitor_layout = "composite"  # one canvas, or "separate" for one synchronized file per monitor
+        self.monitor_recorders = []
+        self.clock_origin = None  # time.monotonic() reading to start the capture clock from
+        self.window_follower = None
         self.audio_stream = None
-        self.audio_frames = []
+        self.audio_ring = None
+        self.audio_writer = None
+        self.audio_samplerate = 44100
+        self.audio_channels = 2
+        self.audio_buffer_seconds = 5.0
+        self.audio_backend = "sounddevice"  # or "synthetic" for a generated tone without a microphone
+        self.mic_gain = 1.0
+        self.audio_sources = []  # more inputs recorded with the mic: [{"device": id or name, "gain": 1.0}, ...]
+        self.audio_mix_mode = "mix"  # or "separate": one audio track per input in the final file
+        self.audio_inputs = []  # an AudioSource per input while recording
+        self.audio_mixer = None
+        self.audio_tracks = 1
+        self.audio_output_channels = self.audio_channels
+        self.audio_meter = AudioMeter(self.audio_channels)  # levels for the UI to poll while monitoring or recording
+        self.monitor_stream = None
+        self.audio_sync = None
+        self.video_start_offset = None  # media time of the first grab, in seconds
         self.current_video_writer = None
         self.current_audio_file = None
+        self.current_video_file = None
+        self.output_mode = "opencv"  # or "ffmpeg" to mux live through an ffmpeg pipe
+        self.active_output_mode = None
+        self.output_container = "mp4"  # "fmp4" or "mkv": crash-safe fragments, written through ffmpeg
+        self.fragment_seconds = 1.0
+        self.active_container = "mp4"
+        self.output_extension = ".mp4"
+        self.fps = 30.0
+        self.scheduler = None
+        self.last_frame = None
+        self.frames_dropped = 0
+        self.frames_duplicated = 0
+        self.segment_duration = None  # seconds per segment, None for a single file
+        self.segment_max_bytes = None  # rotate once a segment grows past this size
+        self.segment_frames = 0
+        self.frames_written = 0
+        self.base_filename = None
+        self.record_audio = False
+        self.frame_size = None
+        self.output_resolution = "native"  # "1080p", "720p", ..., (width, height) or a scale factor
+        self.output_scale = (1.0, 1.0)
+        self.finalizer = None
+        self.finalize_queue = FinalizeQueue()  # stopped recordings are closed, muxed and joined here
+        self.finalize_job = None
+        self.encode_processes = 0  # >0 encodes GOP-aligned segments in that many worker processes
+        self.gop_seconds = 2.0
+        self.process_encoder = None
         self.last_recording = None
+        self.last_recordings = []  # every file of the last recording: one per monitor, or per unjoined segment
+        self.stage_timers = {}
+        self.audio_input_overflows = 0
+        self.audio_input_underflows = 0
+        self.record_started = None
+        self.metrics_path = None  # write get_metrics() here while recording; .prom for Prometheus text
+        self.metrics_interval = 5.0
+        self.metrics_exporter = None
+        self.last_bitrate = None
         self.selected_mic_id = None
-        self.use_gpu = False
         
         # Set up output directory
         self.output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
@@ -41,20 +119,11 @@ class ScreenRecorder:
         self.cursor_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cursors")
         os.makedirs(self.cursor_dir, exist_ok=True)
         self.cursor_image = None
+        self.cursor_compositor = None
+        self.cursor_locator = None
         self.cursor_size = (32, 32)
         self.create_default_cursor()
         self.load_cursor("default")  # Load default cursor immediately
-        
-        # Set up output directory
-        self.output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
-        os.makedirs(self.output_dir, exist_ok=True)
-        
-        # Initialize cursor
-        self.cursor_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cursors")
-        os.makedirs(self.cursor_dir, exist_ok=True)
-        self.cursor_image = None
-        self.cursor_size = (32, 32)
-        self.create_default_cursor()
 
     def create_default_cursor(self):
         cursor_path = os.path.join(self.cursor_dir, "default.png")
@@ -76,6 +145,8 @@ class ScreenRecorder:
         if os.path.exists(cursor_path):
             cursor_img = cv2.imread(cursor_path, cv2.IMREAD_UNCHANGED)
             self.cursor_image = cv2.resize(cursor_img, self.cursor_size)
+            # Precompute the blend planes once instead of per frame
+            self.cursor_compositor = CursorCompositor(self.cursor_image)
         else:
             print(f"Cursor {cursor_name} not found, using default")
             self.create_default_cursor()
@@ -92,146 +163,758 @@ class ScreenRecorder:
         print("Setting preview callback")
         self.preview_callback = callback
 
-    def set_volume_callback(self, callback):
-        self.volume_callback = callback
-
     def start_recording(self):
         if self.recording:
             print("Recording already in progress")
             return
             
+        audio_sink = None
+        # Whatever the last recording left here belongs to its finalize job
+        self.finalizer = None
+        self.process_encoder = None
+        self.current_video_writer = None
+        self.current_video_file = None
+        self.current_audio_file = None
         try:
             print("Starting recording...")
             self.recording = True
             self.paused = False
             self.total_pause_duration = 0
             
-            # Get screen size
-            screen_size = pyautogui.size()
-            print(f"Screen size: {screen_size.width}x{screen_size.height}")
+            monitors = self._selected_monitors()
+            if monitors and self.monitor_layout == "separate":
+                self._start_monitor_recorders(monitors)
+                return
+            
+            # Open the fastest capture backend; its ring must outlive every queued frame
+            if monitors:
+                # One grab thread per monitor, composited onto a single canvas
+                self.backend = CompositeBackend(monitors, self.capture_backend, buffers=self.queue_depth + 2,
+                                                **self.capture_backend_options)
+                self.backend.open()
+            else:
+                region = self._resolve_capture_region()
+                self.backend = open_backend(self.capture_backend, region=region, buffers=self.queue_depth + 2,
+                                            **self.capture_backend_options)
+            if self.capture_window:
+                self.window_follower = WindowFollower(self.backend, self.capture_window)
+                self.window_follower.start()
+            width, height = self.backend.size
+            print(f"Capture backend: {self.backend.name}")
+            print(f"Screen size: {width}x{height}")
             
             # Generate output filename
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            base_filename = self.custom_filename if self.custom_filename else timestamp
-            video_filename = os.path.join(self.output_dir, f"{base_filename}_chunk{self.current_chunk}.mp4")
-            print(f"Video filename: {video_filename}")
+            self.base_filename = self.custom_filename if self.custom_filename else timestamp
+            # The previous recording may still be finalizing files with this name
+            pending = {job.name for job in self.finalize_queue.pending()}
+            name, suffix = self.base_filename, 2
+            while self.base_filename in pending:
+                self.base_filename = f"{name}_{suffix}"
+                suffix += 1
+            audio_plan = self._plan_audio_inputs()
+            self.record_audio = bool(audio_plan)
+            self.audio_tracks = len(audio_plan) if self.audio_mix_mode == "separate" else 1
+            self.audio_output_channels = self.audio_channels * self.audio_tracks
+            # Encoded size; frames are resized once in the convert stage when it differs
+            self.frame_size = resolve_output_size(self.output_resolution, (width, height))
+            self.output_scale = (self.frame_size[0] / width, self.frame_size[1] / height)
+            if self.frame_size != (width, height):
+                print(f"Output size: {self.frame_size[0]}x{self.frame_size[1]}")
+            self.current_chunk = 0
+            self.frames_written = 0
+            self.frames_dropped = 0
+            self.frames_duplicated = 0
+            self.last_frame = None
+            # Audio and video both take media time from this clock, which starts now
+            self.scheduler = FrameScheduler(self.fps)
+            self.scheduler.start(self.clock_origin)
+            self.video_start_offset = None
+            self.audio_sync = None
+            self.stage_timers = {stage: StageTimer() for stage in PIPELINE_STAGES}
+            self.audio_input_overflows = 0
+            self.audio_input_underflows = 0
+            self.record_started = time.monotonic()
+            self.last_bitrate = None
+            # Callers may supply their own pointer source before starting
+            if self.cursor_locator is None:
+                self.cursor_locator = get_cursor_locator()
+            # Output frames cycle through these buffers instead of being allocated per frame:
+            # the encode queue, one being converted, one being written, last_frame and the preview
+            pool_size = self.frame_pool_size or self.queue_depth + 4
+            self.frame_pool = FramePool((self.frame_size[1], self.frame_size[0], 3), pool_size)
+            self._convert_scratch = None
+            
+            self.active_output_mode = self.output_mode
+            if self.active_output_mode == "ffmpeg" and not ffmpeg_available():
+                print("ffmpeg not found. Falling back to OpenCV output.")
+                self.active_output_mode = "opencv"
+            self.active_container = "mp4"
+            if self.output_container in STREAMABLE_CONTAINERS:
+                if ffmpeg_available() and self.encode_processes == 0:
+                    # Fragments are muxed live, audio included, so there is nothing to finalize
+                    self.active_output_mode = "ffmpeg"
+                    self.active_container = self.output_container
+                else:
+                    print(f"{self.output_container} output needs ffmpeg and in-process encoding; recording a regular MP4")
+            self.output_extension = container_extension(self.active_container)
+            
+            # Finished segments are closed and muxed here while recording continues
+            self.finalizer = SegmentFinalizer()
             
             # Initialize video writer
             print("Initializing video writer...")
-            fourcc = cv2.VideoWriter_fourcc(*'XVID')
-            self.current_video_writer = cv2.VideoWriter(
-                video_filename,
-                fourcc,
-                30.0,
-                (screen_size.width, screen_size.height)
-            )
+            if self.encode_processes > 0:
+                audio_sink = self._start_process_encoder(self.backend.frame_shape)
+            else:
+                audio_sink = self._open_segment()
             print("Video writer initialized successfully")
             
             # Initialize audio recording
             print("Initializing audio recording...")
-            if self.selected_mic_id is not None:
-                audio_filename = os.path.join(self.output_dir, f"{base_filename}_chunk{self.current_chunk}.wav")
-                self.current_audio_file = audio_filename
-                self.audio_frames = []
-                self.audio_stream = sd.InputStream(
-                    device=self.selected_mic_id,
-                    channels=2,
-                    callback=self._audio_callback,
-                    samplerate=44100
-                )
-                self.audio_stream.start()
-                print("Audio recording initialized")
+            if self.record_audio:
+                # The recording takes the microphone over from monitoring, meter included
+                self.stop_monitor()
+                self._reset_meter()
+                capacity = int(self.audio_samplerate * self.audio_buffer_seconds)
+                self.audio_inputs = [
+                    AudioSource(plan['name'], self.audio_samplerate, self._input_channels(plan['device']),
+                                capacity, plan['gain'])
+                    for plan in audio_plan
+                ]
+                primary = self.audio_inputs[0]
+                self.audio_sync = primary.sync
+                # Stream audio to its sink as it arrives instead of buffering the session
+                if len(self.audio_inputs) == 1 and primary.gain == 1.0 and primary.channels == self.audio_channels:
+                    # A single input at unity gain needs no mixing
+                    self.audio_ring = primary.ring
+                else:
+                    self.audio_ring = AudioRingBuffer(capacity, self.audio_output_channels)
+                    self.audio_mixer = AudioMixer(self.audio_inputs, self.audio_ring, self.audio_channels,
+                                                  self.audio_mix_mode, self.audio_samplerate).start()
+                self.audio_writer = StreamingAudioWriter(self.audio_ring, audio_sink)
+                self.audio_writer.start()
+                for source, plan in zip(self.audio_inputs, audio_plan):
+                    source.stream = self._open_audio_stream(functools.partial(self._audio_callback, source),
+                                                            plan['device'], source.channels, plan['frequency'])
+                for source in self.audio_inputs:
+                    source.stream.start()
+                self.audio_stream = primary.stream
+                print(f"Audio recording initialized ({', '.join(source.name for source in self.audio_inputs)})")
             
-            # Start recording thread
-            print("Starting recording thread...")
+            # Start capture -> convert -> encode pipeline
+            print("Starting recording threads...")
+            self.capture_queue = FrameQueue(self.queue_depth, self.queue_policy, name="capture")
+            self.encode_queue = FrameQueue(self.queue_depth, self.queue_policy, name="encode")
+            self.encode_queue.on_drop = lambda item: self.frame_pool.release(item[0])
+            self.encode_thread = threading.Thread(target=self._encode_frames, daemon=True)
+            self.convert_thread = threading.Thread(target=self._convert_frames, daemon=True)
             self.screen_thread = threading.Thread(target=self._record_screen)
             self.screen_thread.daemon = True  # Make thread daemon so it exits when main program exits
+            if self.preview_callback:
+                # Preview runs at its own low rate so it never costs capture FPS
+                self.preview_stage = PreviewStage(self.preview_callback, self.preview_size, self.preview_fps,
+                                                  release=self.frame_pool.release,
+                                                  timer=self.stage_timers['preview'])
+                self.preview_stage.start()
+            self.encode_thread.start()
+            self.convert_thread.start()
             self.screen_thread.start()
-            print("Recording thread started")
+            print("Recording threads started")
+            
+            if self.metrics_path:
+                self.metrics_exporter = MetricsExporter(self.get_metrics, self.metrics_path,
+                                                        self.metrics_interval).start()
             
         except Exception as e:
             print(f"Error starting recording: {str(e)}")
             traceback.print_exc()
             self.recording = False
+            self._abort_start(audio_sink)
             raise
 
-    def _record_screen(self):
-        frame_time = 1.0 / 30.0  # Target 30 FPS
-        next_frame_time = time.time()
+    def _abort_start(self, audio_sink):
+        """Release whatever a failed start_recording had opened, newest first."""
+        def attempt(what, func, *args):
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Error {what}: {str(e)}")
+
+        for child in self.monitor_recorders:
+            attempt("stopping monitor recording", child.stop_recording)
+        self.monitor_recorders = []
+        if any(thread and thread.is_alive() for thread in (self.screen_thread, self.convert_thread, self.encode_thread)):
+            attempt("stopping recording threads", self._join_pipeline)
+        for source in self.audio_inputs:
+            if source.stream is not None:
+                attempt("stopping audio stream", source.stream.stop)
+                attempt("closing audio stream", source.stream.close)
+        if self.audio_mixer:
+            attempt("stopping audio mixer", self.audio_mixer.stop)
+        if self.audio_writer:
+            # Closes the audio sink as well
+            attempt("stopping audio writer", self.audio_writer.stop)
+        elif audio_sink is not None:
+            attempt("closing audio sink", audio_sink.close)
+        if self.process_encoder:
+            attempt("stopping encode workers", self.process_encoder.finish, 5.0)
+        if self.current_video_writer is not None:
+            attempt("releasing video writer", self.current_video_writer.release)
+        if self.finalizer:
+            attempt("shutting down finalizer", self.finalizer.shutdown)
+        for path in (self.current_video_file, self.current_audio_file):
+            if path and os.path.exists(path):
+                attempt(f"removing {path}", os.remove, path)
+        self._close_backend()
+        self.audio_inputs = []
+        self.audio_mixer = None
+        self.audio_writer = None
+        self.audio_ring = None
+        self.audio_stream = None
+        self.process_encoder = None
+        self.current_video_writer = None
+        self.finalizer = None
+
+    def pause_recording(self):
+        self.paused = True
+        if self.monitor_recorders:
+            # Each monitor keeps its own clock; the parent has none
+            for child in self.monitor_recorders:
+                child.pause_recording()
+        elif self.scheduler:
+            self.scheduler.pause()
+
+    def resume_recording(self):
+        if self.monitor_recorders:
+            for child in self.monitor_recorders:
+                child.resume_recording()
+            self.total_pause_duration = self.monitor_recorders[0].total_pause_duration
+        elif self.scheduler:
+            # Book the pause before audio resumes so its blocks get the right media time
+            self.total_pause_duration += self.scheduler.resume()
+        self.paused = False
+
+    def set_capture_region(self, region):
+        """Record only (left, top, width, height) of the screen; None for full screen."""
+        self.capture_region = tuple(int(v) for v in region) if region else None
+        self.capture_window = None
+        self.capture_monitors = None
+
+    def set_capture_window(self, title):
+        """Record the first window whose title contains `title`, following it as it moves."""
+        self.capture_window = title or None
+        self.capture_region = None
+        self.capture_monitors = None
+
+    def set_capture_monitors(self, monitors="all", layout="composite"):
+        """Record several displays: "all" or a list of indexes into get_monitors().
+
+        layout "composite" records one canvas covering them all; "separate"
+        records one file per monitor, every file on the same clock.
+        """
+        if layout not in ("composite", "separate"):
+            raise ValueError(f"Unknown monitor layout: {layout}")
+        self.capture_monitors = monitors
+        self.monitor_layout = layout
+        self.capture_region = None
+        self.capture_window = None
+
+    def get_monitors(self):
+        """(left, top, width, height) of each display, primary first."""
+        return get_monitors(self.capture_backend, **self.capture_backend_options)
+
+    def _selected_monitors(self):
+        if not self.capture_monitors:
+            return None
+        monitors = self.get_monitors()
+        if self.capture_monitors == "all":
+            return monitors
+        try:
+            return [monitors[index] for index in self.capture_monitors]
+        except IndexError:
+            raise ValueError(f"Monitors {list(self.capture_monitors)} requested, {len(monitors)} available")
+
+    def _start_monitor_recorders(self, monitors):
+        """Record each monitor with its own recorder, all started on one clock origin.
+
+        Frame slots come from that shared clock, so frame n of every file was
+        captured at the same moment.  The first monitor's recording also gets
+        the audio and the preview.
+        """
+        # The first monitor's recording takes over the microphone
+        self.stop_monitor()
+        origin = time.monotonic()
+        base = self.custom_filename or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.record_started = origin
+        # Only the per-monitor recorders keep a clock; a stale one here would book pauses twice
+        self.scheduler = None
+        self.monitor_recorders = []
+        for index, rect in enumerate(monitors):
+            child = copy.copy(self)
+            child.recording = False
+            child.capture_monitors = None
+            child.monitor_recorders = []
+            child.capture_region = rect
+            child.capture_window = None
+            child.custom_filename = f"{base}_monitor{index + 1}"
+            child.clock_origin = origin
+            child.metrics_path = None
+            child.stage_timers = {}
+            child.last_recording = None
+            child.last_recordings = []
+            if index:
+                child.selected_mic_id = None
+                child.audio_sources = []
+                child.audio_backend = "sounddevice"
+                child.preview_callback = None
+            child.start_recording()
+            self.monitor_recorders.append(child)
+        print(f"Recording {len(monitors)} monitors as separate files")
+        if self.metrics_path:
+            self.metrics_exporter = MetricsExporter(self.get_metrics, self.metrics_path,
+                                                    self.metrics_interval).start()
+
+    def _stop_monitor_recorders(self):
+        # End every capture on the same frame before any of them starts finalizing
+        for child in self.monitor_recorders:
+            child.recording = False
+        children = self.monitor_recorders
+        jobs = [child.stop_recording(wait=False) for child in children]
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
+            self.metrics_exporter = None
+        self.monitor_recorders = []
+
+        def collect(job):
+            # The monitors' own jobs were queued first, so this just gathers their results
+            for child_job in jobs:
+                if child_job:
+                    child_job.wait()
+            self.last_recordings = [path for child in children for path in child.last_recordings]
+            self.last_recording = children[0].last_recording
+            for index, child in enumerate(children):
+                print(f"Monitor {index + 1}: {', '.join(child.last_recordings) or 'nothing recorded'}")
+            return self.last_recording
+
+        self.finalize_job = self.finalize_queue.submit(f"{children[0].base_filename} (all monitors)", collect)
+        return self.finalize_job
+
+    def select_region_interactive(self):
+        """Let the user drag a rectangle on a screenshot; returns the chosen region or None."""
+        backend = open_backend(self.capture_backend)
+        try:
+            screen = to_bgr(backend.grab(), backend.pixel_format)
+            origin = (backend.left, backend.top)
+        finally:
+            backend.close()
+        
+        # Show a reduced copy so the whole desktop fits in the selection window
+        scale = min(1.0, 1280 / screen.shape[1], 720 / screen.shape[0])
+        shown = cv2.resize(screen, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else screen
+        title = "Select capture region (Enter to confirm, Esc to cancel)"
+        x, y, w, h = cv2.selectROI(title, shown, showCrosshair=True)
+        cv2.destroyWindow(title)
+        if w == 0 or h == 0:
+            return None
+        
+        region = (origin[0] + int(x / scale), origin[1] + int(y / scale), int(w / scale), int(h / scale))
+        self.set_capture_region(region)
+        return region
+
+    def _resolve_capture_region(self):
+        if self.capture_window:
+            rect = get_window_rect(self.capture_window)
+            if rect is None:
+                raise ValueError(f"No window found with title containing '{self.capture_window}'")
+            print(f"Following window '{self.capture_window}' at {rect}")
+            return rect
+        return self.capture_region
+
+    def _open_segment(self):
+        """Open the writer for segment `current_chunk` and return its audio sink."""
+        width, height = self.frame_size
+        video_filename = os.path.join(self.output_dir,
+                                      f"{self.base_filename}_chunk{self.current_chunk}{self.output_extension}")
+        audio_sink = None
+        self.current_audio_file = None
+        
+        if self.active_output_mode == "ffmpeg":
+            # One ffmpeg process muxes video and audio while we record
+            self.current_video_writer = FFmpegPipeWriter(
+                video_filename,
+                width,
+                height,
+                fps=self.fps,
+                audio_samplerate=self.audio_samplerate if self.record_audio else None,
+                audio_channels=self.audio_output_channels if self.record_audio else None,
+                audio_tracks=self.audio_tracks,
+                container=self.active_container,
+                fragment_seconds=self.fragment_seconds
+            ).open()
+            audio_sink = self.current_video_writer.audio_sink
+        else:
+            fourcc = cv2.VideoWriter_fourcc(*'XVID')
+            self.current_video_writer = cv2.VideoWriter(
+                video_filename,
+                fourcc,
+                self.fps,
+                (width, height)
+            )
+            if self.record_audio:
+                self.current_audio_file = os.path.join(self.output_dir, f"{self.base_filename}_chunk{self.current_chunk}.wav")
+                import soundfile as sf
+                audio_sink = sf.SoundFile(self.current_audio_file, 'w', self.audio_samplerate, self.audio_output_channels)
+        
+        self.current_video_file = video_filename
+        self.segment_frames = 0
+        print(f"Video filename: {video_filename}")
+        return audio_sink
+
+    def _start_process_encoder(self, frame_shape):
+        """Encode in worker processes; returns the session's audio sink."""
+        if self.segment_duration or self.segment_max_bytes:
+            print("Segment rotation is not used with process encoding; recording one file")
+        self.active_output_mode = "process"
+        self.process_encoder = ProcessEncoder(
+            self.encode_processes,
+            frame_shape,
+            os.path.join(self.output_dir, f"{self.base_filename}_gop{{}}.mp4"),
+            fps=self.fps,
+            out_size=self.frame_size,
+            cursor_image=self.cursor_image,
+            gop_frames=int(self.gop_seconds * self.fps),
+            pixel_format=self.backend.pixel_format
+        ).start()
+        print(f"Encoding with {self.encode_processes} worker processes")
+        
+        self.current_video_writer = None
+        self.current_video_file = os.path.join(self.output_dir, f"{self.base_filename}_chunk0.mp4")
+        self.current_audio_file = None
+        if self.record_audio:
+            self.current_audio_file = os.path.join(self.output_dir, f"{self.base_filename}_chunk0.wav")
+            import soundfile as sf
+            return sf.SoundFile(self.current_audio_file, 'w', self.audio_samplerate, self.audio_output_channels)
+        return None
+
+    def _finish_process_encoder(self):
+        output_path = os.path.join(self.output_dir, f"{self.base_filename}_part0.mp4")
+        self.finalizer.submit(finish_process_encoder, self.process_encoder, self.current_video_file,
+                              self.current_audio_file, output_path, self.audio_tracks, self.finalizer.cancelled)
+        self._keep_process_encoder_stats()
+        self.process_encoder = None
+
+    def _keep_process_encoder_stats(self):
+        # get_frame_stats reads the encoder's counters while it exists; keep them once it is gone
+        self.frames_written = self.process_encoder.next_index
+        self.frames_dropped += self.process_encoder.dropped
+        self.frames_duplicated += self.process_encoder.duplicated
+
+    def _finish_segment(self, writer, video_file, audio_file, chunk, audio_done=None):
+        # OpenCV segments still need their audio muxed in; ffmpeg ones are complete on release
+        output_path = None
+        if self.active_output_mode != "ffmpeg":
+            output_path = os.path.join(self.output_dir, f"{self.base_filename}_part{chunk}.mp4")
+        self.finalizer.submit(finalize_segment, writer, video_file, audio_file, audio_done, output_path,
+                              self.audio_tracks, self.finalizer.cancelled)
+
+    def _segment_due(self):
+        if self.segment_duration and self.segment_frames >= self.segment_duration * self.fps:
+            return True
+        # Checking the size once a second is plenty
+        if self.segment_max_bytes and self.segment_frames % max(1, int(self.fps)) == 0:
+            size = 0
+            for path in (self.current_video_file, self.current_audio_file):
+                if path and os.path.exists(path):
+                    size += os.path.getsize(path)
+            return size >= self.segment_max_bytes
+        return False
+
+    def _rotate_segment(self):
+        finished = (self.current_video_writer, self.current_video_file, self.current_audio_file, self.current_chunk)
+        self.current_chunk += 1
+        audio_sink = self._open_segment()
         
+        # Cut audio on the same media-time boundary as the video
+        audio_done = None
+        if self.audio_writer:
+            position = int(round(self.frames_written * self.audio_samplerate / self.fps))
+            audio_done = self.audio_writer.split_at(position, audio_sink)
+        
+        self._finish_segment(*finished, audio_done=audio_done)
+        print(f"Started segment {self.current_chunk}")
+
+    def _record_screen(self):
         try:
             while self.recording:
-                if not self.paused:
-                    current_time = time.time()
-                    
-                    if current_time >= next_frame_time:
-                        # Capture screen
-                        screenshot = pyautogui.screenshot()
-                        frame = np.array(screenshot)
-                        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-                        
-                        # Get cursor position and overlay cursor
-                        x, y = pyautogui.position()
-                        frame = self.overlay_cursor(frame, x, y)
-                        
-                        # Write frame
-                        if self.current_video_writer is not None:
-                            self.current_video_writer.write(frame)
-                        
-                        # Update preview if callback is set
-                        if self.preview_callback:
-                            try:
-                                self.preview_callback(frame)
-                            except Exception as e:
-                                print(f"Preview callback error: {str(e)}")
-                        
-                        # Calculate next frame time
-                        next_frame_time = current_time + frame_time
-                    
-                    time.sleep(max(0, next_frame_time - time.time()))  # Sleep only if needed
-                else:
+                if self.paused:
+                    self.scheduler.pause()
                     time.sleep(0.1)  # Longer sleep while paused
+                    continue
+                self.total_pause_duration += self.scheduler.resume()
+                
+                # Deadlines come from a fixed schedule, so late frames do not accumulate drift
+                self.scheduler.wait()
+                pts = self.scheduler.timestamp()
+                if self.video_start_offset is None:
+                    self.video_start_offset = pts
+                
+                # Grab screen and cursor together; conversion happens downstream
+                started = time.perf_counter()
+                view = self.backend.grab()
+                x, y = self.cursor_locator() if self.cursor_locator else NO_CURSOR
+                self.stage_timers['grab'].record(time.perf_counter() - started)
+                self.capture_queue.put((view, x - self.backend.left, y - self.backend.top, pts))
             
         except Exception as e:
             print(f"Error in screen recording: {str(e)}")
             traceback.print_exc()
         finally:
             self.recording = False
+            self.capture_queue.close()
+
+    def _convert_frames(self):
+        try:
+            while True:
+                try:
+                    view, x, y, pts = self.capture_queue.get()
+                except QueueClosed:
+                    break
+                if self.process_encoder:
+                    # Conversion, cursor and encoding all happen in the worker processes
+                    if self.process_encoder.submit(view, x, y, pts) and self.preview_stage:
+                        self.preview_stage.submit(view, self.backend.pixel_format)
+                    continue
+                
+                # One cvtColor pass out of the backend's shared buffer into a pooled frame; at a
+                # lower output resolution the view is resized first, into a reused scratch frame
+                started = time.perf_counter()
+                pixel_format = self.backend.pixel_format
+                frame = self.frame_pool.acquire()
+                if view.shape[1::-1] != self.frame_size:
+                    self._convert_scratch = downscale_for_encode(view, self.frame_size, out=self._convert_scratch)
+                    to_bgr(self._convert_scratch, pixel_format, out=frame)
+                    scale_x, scale_y = self.output_scale
+                    x, y = int(x * scale_x), int(y * scale_y)
+                else:
+                    to_bgr(view, pixel_format, out=frame)
+                converted = time.perf_counter()
+                self.overlay_cursor(frame, x, y)
+                self.stage_timers['convert'].record(converted - started)
+                self.stage_timers['cursor'].record(time.perf_counter() - converted)
+                if not self.encode_queue.put((frame, pts)):
+                    self.frame_pool.release(frame)
+        except Exception as e:
+            print(f"Error converting frames: {str(e)}")
+            traceback.print_exc()
+        finally:
+            self.capture_queue.close()
+            self.encode_queue.close()
+
+    def _encode_frames(self):
+        try:
+            while True:
+                try:
+                    frame, pts = self.encode_queue.get()
+                except QueueClosed:
+                    break
+                
+                # Latest frame wins; the preview stage downsamples it on its own thread
+                # and hands the buffer back to the pool when done
+                if self.preview_stage:
+                    self.frame_pool.retain(frame)
+                    self.preview_stage.submit(frame)
+                
+                # Write frame; this hands the buffer back to the pool
+                if self.current_video_writer is not None:
+                    started = time.perf_counter()
+                    self._write_timed_frame(frame, pts)
+                    self.stage_timers['encode'].record(time.perf_counter() - started)
+                else:
+                    self.frame_pool.release(frame)
+        except Exception as e:
+            print(f"Error encoding frames: {str(e)}")
+            traceback.print_exc()
+        finally:
+            self.encode_queue.close()
+
+    def _write_timed_frame(self, frame, pts):
+        # Hold a constant frame rate: each capture timestamp maps to one output slot
+        slot = int(round(pts * self.fps))
+        if slot < self.frames_written:
+            self.frames_dropped += 1
+            self.frame_pool.release(frame)
+            return
+        while self.frames_written < slot and self.last_frame is not None:
+            self._write_frame(self.last_frame)
+            self.frames_duplicated += 1
+        self._write_frame(frame)
+        # Writers copy the frame out before returning, so only last_frame keeps a buffer
+        self.frame_pool.release(self.last_frame)
+        self.last_frame = frame
+
+    def _write_frame(self, frame):
+        self.current_video_writer.write(frame)
+        self.frames_written += 1
+        self.segment_frames += 1
+        if self._segment_due():
+            self._rotate_segment()
+
+    def get_frame_stats(self):
+        """Frame counters for the current (or last) recording."""
+        queue_drops = sum(q.dropped for q in (self.capture_queue, self.encode_queue) if q)
+        stats = {
+            'written': self.frames_written,
+            'late': self.scheduler.late if self.scheduler else 0,
+            'dropped': self.frames_dropped + queue_drops,
+            'duplicated': self.frames_duplicated,
+        }
+        if self.process_encoder:
+            stats['written'] = self.process_encoder.next_index
+            stats['dropped'] += self.process_encoder.dropped
+            stats['duplicated'] += self.process_encoder.duplicated
+        return stats
+
+    def get_stage_stats(self):
+        """Per-stage latency summaries (count, mean/p50/p95/p99/max in ms) keyed by stage."""
+        return {stage: timer.summary() for stage, timer in self.stage_timers.items()}
+
+    def get_metrics(self):
+        """Snapshot of everything the pipeline tracks, as plain JSON-serializable values."""
+        if self.monitor_recorders:
+            # Separate monitor files: the first monitor's pipeline, plus every monitor's own
+            metrics = self.monitor_recorders[0].get_metrics()
+            metrics['monitors'] = [child.get_metrics() for child in self.monitor_recorders]
+            return metrics
+        audio = {
+            'buffered_frames': self.audio_ring.available() if self.audio_ring else 0,
+            'overruns': self.audio_ring.overruns if self.audio_ring else 0,
+            'input_overflows': self.audio_input_overflows,
+            'input_underflows': self.audio_input_underflows,
+            'frames_written': self.audio_writer.frames_written if self.audio_writer else 0,
+        }
+        if self.audio_mixer:
+            audio['sources'] = [
+                {
+                    'name': source.name,
+                    'gain': source.gain,
+                    'buffered_frames': source.ring.available(),
+                    'overruns': source.ring.overruns,
+                    'filled_frames': filled,
+                    'drift_ppm': source.sync.drift_ppm(),
+                }
+                for source, filled in zip(self.audio_inputs, self.audio_mixer.filled)
+            ]
+        sync = self.audio_sync.summary() if self.audio_sync else {}
+        sync['video_start_offset_ms'] = None if self.video_start_offset is None else self.video_start_offset * 1000
+        return {
+            'timestamp': time.time(),
+            'recording': self.recording,
+            'elapsed_s': time.monotonic() - self.record_started if self.record_started else 0.0,
+            'fps': self.fps,
+            'frames': self.get_frame_stats(),
+            'stages': self.get_stage_stats(),
+            'queues': {
+                'capture': self.capture_queue.qsize() if self.capture_queue else 0,
+                'encode': self.encode_queue.qsize() if self.encode_queue else 0,
+            },
+            'audio': audio,
+            'sync': sync,
+            'encoder': {
+                'mode': self.active_output_mode,
+                'segment': self.current_chunk,
+                'bitrate_bps': self._output_bitrate(),
+            },
+            'pool': self.get_pool_stats(),
+        }
+
+    def _output_bitrate(self):
+        # Once stopped and finalized: average over the finished recording
+        finalized = self.finalize_job is None or self.finalize_job.done
+        if not self.recording and finalized and self.last_recording and self.frames_written:
+            if os.path.exists(self.last_recording):
+                return os.path.getsize(self.last_recording) * 8 * self.fps / self.frames_written
+        # ffmpeg reports what it has encoded; otherwise estimate from the segment file,
+        # which trails because writers buffer
+        writer_bitrate = getattr(self.current_video_writer, 'bitrate', None)
+        if writer_bitrate:
+            self.last_bitrate = writer_bitrate
+            return writer_bitrate
+        path = self.current_video_file
+        if path and self.segment_frames and os.path.exists(path):
+            size = os.path.getsize(path)
+            if size >= MIN_BITRATE_BYTES:
+                self.last_bitrate = size * 8 * self.fps / self.segment_frames
+        return self.last_bitrate
+
+    def get_pool_stats(self):
+        """Frame buffer pool usage: size, free, in_use, hits and misses."""
+        if self.frame_pool is None:
+            return None
+        return self.frame_pool.stats()
+
+    def _join_pipeline(self, timeout=2.0, stall_timeout=60.0):
+        """Stop capture and wait for convert and encode to drain their queues.
+
+        Returns False if the encode thread is still running after
+        stall_timeout; the writer must then stay open, since it may still be
+        writing to it.
+        """
+        drained = True
+        for name, thread, output in (("capture", self.screen_thread, self.capture_queue),
+                                     ("convert", self.convert_thread, self.encode_queue),
+                                     ("encode", self.encode_thread, None)):
+            if thread and thread.is_alive():
+                print(f"Waiting for {name} thread to finish...")
+                thread.join(timeout=timeout)
+                # Capture only stops between grabs; downstream stages finish once their input is closed
+                waited = timeout
+                while thread.is_alive() and name != "capture" and waited < stall_timeout:
+                    print(f"Still waiting for {name} thread ({waited:.0f}s)...")
+                    thread.join(timeout=timeout)
+                    waited += timeout
+                if thread.is_alive():
+                    print(f"Error: {name} thread did not finish within {waited:.0f}s")
+                    # Only the encode thread touches the writer
+                    if name == "encode":
+                        drained = False
+            # A stuck stage must not hold up the ones after it
+            if output is not None:
+                output.close()
+        if self.preview_stage:
+            self.preview_stage.stop()
+            self.preview_stage = None
+        stats = self.get_frame_stats()
+        print(f"Frames written: {stats['written']}, late: {stats['late']}, "
+              f"dropped: {stats['dropped']}, duplicated: {stats['duplicated']}")
+        if self.frame_pool:
+            self.frame_pool.release(self.last_frame)
+            self.last_frame = None
+            pool = self.frame_pool.stats()
+            print(f"Frame pool: {pool['size']} buffers, {pool['hits']} hits, {pool['misses']} misses")
+        self._close_backend()
+        return drained
+
+    def _close_backend(self):
+        if self.window_follower:
+            self.window_follower.stop()
+            self.window_follower = None
+        if self.backend:
+            try:
+                self.backend.close()
+            except Exception as e:
+                print(f"Error closing capture backend: {str(e)}")
+            self.backend = None
 
     def overlay_cursor(self, frame, x, y):
-        if self.cursor_image is None or frame is None:
+        compositor = self.cursor_compositor
+        if compositor is None or frame is None:
             return frame
             
         try:
-            h, w = self.cursor_image.shape[:2]
-            
             # Ensure coordinates are within frame bounds
             if x >= 0 and y >= 0 and x < frame.shape[1] and y < frame.shape[0]:
-                # Calculate overlay boundaries
-                y1, y2 = max(0, y), min(frame.shape[0], y + h)
-                x1, x2 = max(0, x), min(frame.shape[1], x + w)
-                
-                if y2 > y1 and x2 > x1:  # Only proceed if we have valid dimensions
-                    # Adjust cursor image crop coordinates
-                    cursor_y1 = max(0, -y)
-                    cursor_x1 = max(0, -x)
-                    cursor_y2 = cursor_y1 + (y2 - y1)
-                    cursor_x2 = cursor_x1 + (x2 - x1)
-                    
-                    # Create alpha mask
-                    alpha = self.cursor_image[cursor_y1:cursor_y2, cursor_x1:cursor_x2, 3:4].astype(float) / 255.0
-                    
-                    # Get cursor RGB
-                    cursor_rgb = self.cursor_image[cursor_y1:cursor_y2, cursor_x1:cursor_x2, :3]
-                    
-                    # Extract frame region
-                    frame_region = frame[y1:y2, x1:x2]
-                    
-                    # Blend cursor with frame
-                    blended = frame_region * (1 - alpha) + cursor_rgb * alpha
-                    
-                    # Update frame region
-                    frame[y1:y2, x1:x2] = blended.astype(np.uint8)
+                compositor.composite(frame, x, y)
             
         except Exception as e:
             print(f"Error overlaying cursor: {str(e)}")
@@ -239,57 +922,184 @@ class ScreenRecorder:
         
         return frame
 
-    def _audio_callback(self, indata, frames, time, status):
+    def _audio_callback(self, source, indata, frames, time_info, status):
+        # Count PortAudio status flags instead of printing from the audio thread
         if status:
-            print(f"Audio status: {status}")
-        if not self.paused:
-            self.audio_frames.append(indata.copy())
-            # Calculate volume for meter
-            volume = np.linalg.norm(indata) * 10
-            if self.volume_callback:
-                self.volume_callback(min(1.0, volume))
-
-    def stop_recording(self):
+            if status.input_overflow:
+                self.audio_input_overflows += 1
+            if status.input_underflow:
+                self.audio_input_underflows += 1
+        scheduler = self.scheduler
+        # Until the scheduler has booked a pause, media time is not final
+        if not self.paused and not scheduler.paused:
+            # Stamp the block on the video's clock and write it where it belongs on that timeline
+            captured = source.sync.block_time(time_info, frames, scheduler.clock())
+            # Read once: the GUI thread may resume a pause while this block is handled
+            resumed_at = scheduler.resumed_at
+            if captured < resumed_at:
+                # Keep only what was captured after recording started or resumed
+                skip = int(round((resumed_at - captured) * self.audio_samplerate))
+                if skip >= frames:
+                    return
+                indata = indata[skip:]
+                captured = resumed_at
+            block = source.sync.align(indata, scheduler.media_time(captured), run=resumed_at)
+            source.ring.write(block)
+            # The meter follows the microphone
+            if source is self.audio_inputs[0]:
+                self.audio_meter.update(indata)
+
+    def _open_audio_stream(self, callback, device=None, channels=None, frequency=440.0):
+        """Open (but not start) an input stream; device None is the selected microphone."""
+        if self.audio_backend == "synthetic" or device == "synthetic":
+            return SyntheticAudioStream(
+                samplerate=self.audio_samplerate,
+                channels=channels or self.audio_channels,
+                callback=callback,
+                frequency=frequency
+            )
+        # sounddevice initializes PortAudio on import, so only load it when needed
+        import sounddevice as sd
+        return sd.InputStream(
+            device=self.selected_mic_id if device is None else device,
+            channels=channels or self.audio_channels,
+            callback=callback,
+            samplerate=self.audio_samplerate
+        )
+
+    def _plan_audio_inputs(self):
+        """The inputs to record: the selected mic first, then each of audio_sources."""
+        plan = []
+        if self.selected_mic_id is not None or self.audio_backend == "synthetic":
+            plan.append({'name': "mic", 'device': None, 'gain': self.mic_gain, 'frequency': 440.0})
+        for index, source in enumerate(self.audio_sources):
+            device = source['device']
+            if device != "synthetic" and self.audio_backend != "synthetic":
+                device = self.find_microphone(device)
+            plan.append({
+                'name': source.get('name') or f"source{index + 1}",
+                'device': device,
+                'gain': float(source.get('gain', 1.0)),
+                'frequency': source.get('frequency', 440.0 * (index + 2) / 2),
+            })
+        return plan
+
+    def _input_channels(self, device):
+        # Mono devices record mono; the mixer spreads them over the output channels
+        if self.audio_backend == "synthetic" or device == "synthetic":
+            return self.audio_channels
+        import sounddevice as sd
+        info = sd.query_devices(self.selected_mic_id if device is None else device, 'input')
+        return max(1, min(self.audio_channels, int(info['max_input_channels'])))
+
+    def _reset_meter(self):
+        if self.audio_meter.channels != self.audio_channels:
+            self.audio_meter = AudioMeter(self.audio_channels)
+        self.audio_meter.reset()
+
+    def start_monitor(self):
+        """Meter the selected microphone without recording; poll audio_meter.read() for levels."""
+        if self.monitor_stream is not None or self.recording:
+            return
+        self._reset_meter()
+        self.monitor_stream = self._open_audio_stream(self._monitor_callback)
+        self.monitor_stream.start()
+
+    def _monitor_callback(self, indata, frames, time_info, status):
+        if status:
+            if status.input_overflow:
+                self.audio_input_overflows += 1
+            if status.input_underflow:
+                self.audio_input_underflows += 1
+        self.audio_meter.update(indata)
+
+    def stop_monitor(self):
+        if self.monitor_stream is None:
+            return
+        try:
+            self.monitor_stream.stop()
+            self.monitor_stream.close()
+        except Exception as e:
+            print(f"Error stopping audio monitor: {str(e)}")
+            traceback.print_exc()
+        self.monitor_stream = None
+        self.audio_meter.reset()
+
+    def stop_recording(self, wait=True):
+        """Stop capturing and queue the recording's finalization.
+
+        Capture and audio are shut down before this returns.  Closing, muxing
+        and joining the segments runs as a FinalizeJob on finalize_queue, which
+        sets last_recording when it completes.  With wait=False this returns
+        straight away, so a new recording can start while the previous one is
+        still being finalized.  Returns the job (None if nothing was queued).
+        """
+        job = None
         try:
             print("Stopping recording...")
             self.recording = False
+            if self.monitor_recorders:
+                job = self._stop_monitor_recorders()
+                print("Recording stopped successfully")
+                if wait:
+                    job.wait()
+                return job
             
-            if self.screen_thread and self.screen_thread.is_alive():
-                print("Waiting for recording thread to finish...")
-                self.screen_thread.join(timeout=2.0)  # Wait up to 2 seconds
+            # Wait for the pipeline to drain queued frames before releasing the writer
+            drained = self._join_pipeline()
             
+            # Flush audio first; in ffmpeg mode the writer shares the muxer's audio pipe
             try:
-                if self.current_video_writer:
-                    self.current_video_writer.release()
-                    print("Video writer released")
-            except Exception as e:
-                print(f"Error releasing video writer: {str(e)}")
-                traceback.print_exc()
-            
-            try:
-                if self.audio_stream:
-                    self.audio_stream.stop()
-                    self.audio_stream.close()
-                    self._save_audio()
-                    print("Audio stream closed and saved")
+                for source in self.audio_inputs:
+                    source.stream.stop()
+                    source.stream.close()
+                if self.audio_inputs:
+                    print("Audio stream closed")
+                if self.audio_mixer:
+                    self.audio_mixer.stop()
+                    for source, filled in zip(self.audio_inputs, self.audio_mixer.filled):
+                        if filled:
+                            print(f"Audio input {source.name} fell behind; {filled} frames filled with silence")
+                if self.audio_writer:
+                    self.audio_writer.stop()
+                    print("Audio file saved")
+                if self.audio_sync:
+                    self._log_sync()
             except Exception as e:
                 print(f"Error stopping audio stream: {str(e)}")
                 traceback.print_exc()
             
-            # Set last recording to video file first in case combining fails
-            if hasattr(self, 'custom_filename'):
-                video_path = os.path.join(self.output_dir, f"{self.custom_filename}_chunk{self.current_chunk}.mp4")
-                if os.path.exists(video_path):
-                    self.last_recording = video_path
-            
-            # Try to combine files if we have both audio and video
+            # The last segment is finalized like the others, then all are joined in the background
             try:
-                self._combine_audio_video()
-                print("Audio and video combined")
+                if not drained:
+                    # Releasing a writer the encode thread is still inside of would corrupt the segment
+                    print(f"Error: encoder is still writing {self.current_video_file}; it was left open. "
+                          f"Run 'recover' on {self.output_dir} once it exits")
+                    self.finalizer.shutdown(wait=False)
+                    if self.process_encoder:
+                        self._keep_process_encoder_stats()
+                    self.process_encoder = None
+                else:
+                    if self.process_encoder:
+                        self._finish_process_encoder()
+                    elif self.current_video_writer:
+                        self._finish_segment(self.current_video_writer, self.current_video_file,
+                                             self.current_audio_file, self.current_chunk)
+                    final_path = os.path.join(self.output_dir, f"{self.base_filename}_final{self.output_extension}")
+                    job = self.finalize_queue.submit(
+                        self.base_filename,
+                        functools.partial(self._complete_recording, self.finalizer, final_path),
+                        self.finalizer.cancelled
+                    )
+                    self.finalize_job = job
             except Exception as e:
-                print(f"Error combining audio and video: {str(e)}")
+                print(f"Error finalizing recording: {str(e)}")
                 traceback.print_exc()
-                # Keep the separate video and audio files if combining fails
+            
+            # Final snapshot once every counter has settled
+            if self.metrics_exporter:
+                self.metrics_exporter.stop()
+                self.metrics_exporter = None
             
             print("Recording stopped successfully")
             
@@ -300,91 +1110,59 @@ class ScreenRecorder:
             # Clean up resources
             self.current_video_writer = None
             self.audio_stream = None
-            self.audio_frames = []
+            self.audio_inputs = []
+            self.audio_mixer = None
+            self.audio_writer = None
+            self.audio_ring = None
+        if job and wait:
+            job.wait()
+        return job
 
-    def _save_audio(self):
-        try:
-            if self.audio_frames and self.current_audio_file:
-                print("Saving audio file...")
-                audio_data = np.concatenate(self.audio_frames, axis=0)
-                sf.write(self.current_audio_file, audio_data, 44100)
-                print("Audio file saved successfully")
-        except Exception as e:
-            print(f"Error saving audio: {str(e)}")
-            traceback.print_exc()
-        finally:
-            self.audio_frames = []
+    def _complete_recording(self, finalizer, final_path, job):
+        """Finalize job: wait for every segment, then join them into final_path."""
+        def on_segment(done, total):
+            # The join is the last step
+            job.progress = done / (total + 1)
 
-    def _combine_audio_video(self):
-        try:
-            if not hasattr(self, 'custom_filename') or not self.custom_filename:
-                print("No filename set for combining files")
-                return
-            
-            video_path = os.path.join(self.output_dir, f"{self.custom_filename}_chunk{self.current_chunk}.mp4")
-            final_path = os.path.join(self.output_dir, f"{self.custom_filename}_final.mp4")
-            
-            if not os.path.exists(video_path):
-                print(f"Video file not found: {video_path}")
-                return
-                
-            # Check if ffmpeg is available
-            try:
-                subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True)
-            except FileNotFoundError:
-                print("ffmpeg not found. Skipping audio-video combination.")
-                self.last_recording = video_path
-                return
-            
-            print(f"Combining files to: {final_path}")
-            
-            if self.current_audio_file and os.path.exists(self.current_audio_file):
-                command = [
-                    'ffmpeg', '-y',
-                    '-i', video_path,
-                    '-i', self.current_audio_file,
-                    '-c:v', 'copy',
-                    '-c:a', 'aac',
-                    final_path
-                ]
-                print("Running ffmpeg with audio...")
-            else:
-                command = [
-                    'ffmpeg', '-y',
-                    '-i', video_path,
-                    '-c:v', 'copy',
-                    final_path
-                ]
-                print("Running ffmpeg without audio...")
-            
-            result = subprocess.run(command, capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"FFmpeg error: {result.stderr}")
-                self.last_recording = video_path  # Keep original video if ffmpeg fails
-                return
-            
-            # Clean up temporary files only if combining was successful
-            if os.path.exists(final_path):
-                print("Cleaning up temporary files...")
-                try:
-                    if os.path.exists(video_path):
-                        os.remove(video_path)
-                    if self.current_audio_file and os.path.exists(self.current_audio_file):
-                        os.remove(self.current_audio_file)
-                except Exception as e:
-                    print(f"Error cleaning up temporary files: {str(e)}")
-                self.last_recording = final_path
-                print("Cleanup completed")
-            else:
-                print("Final file not created, keeping temporary files")
-                self.last_recording = video_path
-            
-        except Exception as e:
-            print(f"Error combining audio and video: {str(e)}")
-            traceback.print_exc()
-            self.last_recording = video_path  # Use the video file if combining fails
+        segment_paths = []
+        for result in finalizer.results(on_segment):
+            # Process-mode workers hand back all their segments when they could not be joined
+            if isinstance(result, list):
+                segment_paths.extend(result)
+            elif result:
+                segment_paths.append(result)
+        finalizer.shutdown()
+        print(f"Finalized {len(segment_paths)} segment(s)")
+        if job.cancelled:
+            print(f"Finalizing {job.name} cancelled; run 'recover' to join its segments later")
+            return None
+        if not segment_paths:
+            return None
+        combined = concat_segments(segment_paths, final_path) if ffmpeg_available() else None
+        if combined is None:
+            # Without ffmpeg (or if joining failed) the segments are the recording
+            self.last_recordings = segment_paths
+            self.last_recording = segment_paths[0]
+            reason = "joining them failed" if ffmpeg_available() else "ffmpeg not found; any audio is in the WAV files alongside"
+            print(f"Recording left as {len(segment_paths)} segment file(s) ({reason}): {', '.join(segment_paths)}")
+            return self.last_recording
+        self.last_recording = combined
+        self.last_recordings = [combined]
+        print("Audio and video combined")
+        return self.last_recording
+
+    def _log_sync(self):
+        sync = self.audio_sync.summary()
+        video_ms = (self.video_start_offset or 0.0) * 1000
+        audio_ms = sync['start_offset_ms'] or 0.0
+        drift = sync['drift_ppm']
+        print(f"A/V sync: video started at {video_ms:+.1f} ms, audio at {audio_ms:+.1f} ms; "
+              f"audio clock drift {'unknown' if drift is None else f'{drift:+.0f} ppm'}; "
+              f"padded {sync['padded_frames']}, trimmed {sync['trimmed_frames']}, "
+              f"stretched {sync['stretched_frames']:+d} samples")
 
     def get_available_mics(self):
+        import sounddevice as sd
         devices = sd.query_devices()
         mics = []
         for i, device in enumerate(devices):
@@ -400,482 +1178,211 @@ class ScreenRecorder:
     def set_microphone(self, device_id):
         self.selected_mic_id = device_id
 
+    def find_microphone(self, spec):
+        """Resolve a device id, "default" or part of a device name to an input device id."""
+        if spec is None:
+            return None
+        spec = str(spec).strip()
+        if spec.isdigit():
+            return int(spec)
+        if spec.lower() == "default":
+            import sounddevice as sd
+            return sd.default.device[0]
+        for mic in self.get_available_mics():
+            if spec.lower() in mic['name'].lower():
+                return mic['id']
+        raise ValueError(f"No microphone matching '{spec}'")
+
     def set_filename(self, filename):
         self.custom_filename = filename
 
-class RecorderGUI:
-    def __init__(self):
-        self.recorder = ScreenRecorder()
-        self.version_control = VersionControl()
-        
-        self.window = ctk.CTk()
-        self.window.title(f"Screen Recorder v{get_version()}")
-        self.window.geometry("1200x700")
-        self.window.resizable(False, False)
-        
-        # Configure grid weights
-        self.window.grid_columnconfigure(0, weight=1)
-        self.window.grid_columnconfigure(1, weight=0)  # Control panel
-        self.window.grid_rowconfigure(0, weight=1)
-        
-        # Create main frame for preview
-        self.preview_frame = ctk.CTkFrame(self.window)
-        self.preview_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
-        
-        # Create preview canvas with fixed size
-        self.preview_canvas = ctk.CTkCanvas(
-            self.preview_frame,
-            width=640,
-            height=360,
-            bg='black'
-        )
-        self.preview_canvas.pack(expand=True, padx=10, pady=10)
-        
-        # Create control panel frame with fixed width
-        self.control_panel = ctk.CTkFrame(self.window, width=300)
-        self.control_panel.grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
-        self.control_panel.grid_propagate(False)  # Prevent frame from shrinking
-        
-        # Theme toggle
-        self.theme_button = ctk.CTkButton(
-            self.control_panel,
-            text="Toggle Theme",
-            command=self.toggle_theme
-        )
-        self.theme_button.pack(pady=5)
-        
-        # Cursor selection
-        self.cursor_frame = ctk.CTkFrame(self.control_panel)
-        self.cursor_frame.pack(fill="x", padx=5, pady=5)
-        
-        self.cursor_label = ctk.CTkLabel(
-            self.cursor_frame,
-            text="Select Cursor:"
-        )
-        self.cursor_label.pack(pady=(5, 0))
-        
-        self.available_cursors = self.recorder.get_available_cursors()
-        self.cursor_var = ctk.StringVar(value="default")
-        self.cursor_menu = ctk.CTkOptionMenu(
-            self.cursor_frame,
-            values=self.available_cursors,
-            variable=self.cursor_var,
-            command=self.on_cursor_select,
-            width=200
-        )
-        self.cursor_menu.pack(pady=5)
-        
-        # Custom cursor upload button
-        self.upload_cursor_button = ctk.CTkButton(
-            self.cursor_frame,
-            text="Upload Custom Cursor",
-            command=self.upload_custom_cursor
-        )
-        self.upload_cursor_button.pack(pady=5)
-        
-        # Microphone selection frame
-        self.mic_frame = ctk.CTkFrame(self.control_panel)
-        self.mic_frame.pack(fill="x", padx=5, pady=5)
-        
-        self.mic_label = ctk.CTkLabel(
-            self.mic_frame,
-            text="Select Microphone:"
-        )
-        self.mic_label.pack(pady=(5, 0))
-        
-        # Get available microphones
-        self.available_mics = self.recorder.get_available_mics()
-        self.mic_names = [f"{mic['name']}{' (Default)' if mic['default'] else ''}" for mic in self.available_mics]
-        
-        self.mic_var = ctk.StringVar(value=self.mic_names[0] if self.mic_names else "No microphones found")
-        self.mic_menu = ctk.CTkOptionMenu(
-            self.mic_frame,
-            values=self.mic_names,
-            variable=self.mic_var,
-            command=self.on_mic_select,
-            width=200
-        )
-        self.mic_menu.pack(pady=5)
-        
-        # Set initial microphone
-        if self.available_mics:
-            default_mic = next((mic for mic in self.available_mics if mic['default']), self.available_mics[0])
-            self.recorder.set_microphone(default_mic['id'])
-        
-        # Filename input
-        self.filename_label = ctk.CTkLabel(
-            self.control_panel,
-            text="Recording Name:"
-        )
-        self.filename_label.pack(pady=(10, 0))
-        
-        self.filename_entry = ctk.CTkEntry(
-            self.control_panel,
-            width=200
-        )
-        self.filename_entry.pack(pady=(5, 20))
-        
-        # Recording status frame
-        self.status_frame = ctk.CTkFrame(self.control_panel)
-        self.status_frame.pack(fill="x", padx=5, pady=5)
-        
-        # Recording indicator light
-        self.indicator_canvas = ctk.CTkCanvas(
-            self.status_frame,
-            width=20,
-            height=20,
-            bg=self.window._apply_appearance_mode(ctk.ThemeManager.theme["CTkFrame"]["fg_color"]),
-            highlightthickness=0
-        )
-        self.indicator_canvas.pack(side="left", padx=5)
-        self.indicator_light = self.indicator_canvas.create_oval(5, 5, 15, 15, fill="gray")
-        
-        # Timer label
-        self.timer_label = ctk.CTkLabel(
-            self.status_frame,
-            text="00:00:00",
-            font=("Arial", 16)
-        )
-        self.timer_label.pack(side="left", padx=10)
-        
-        # Volume meter
-        self.volume_frame = ctk.CTkFrame(self.control_panel)
-        self.volume_frame.pack(fill="x", padx=5, pady=10)
-        
-        self.volume_label = ctk.CTkLabel(
-            self.volume_frame,
-            text="Volume Level"
-        )
-        self.volume_label.pack()
-        
-        self.volume_meter = ctk.CTkProgressBar(
-            self.volume_frame,
-            width=180,
-            height=15,
-            border_width=2,
-            progress_color="green"
-        )
-        self.volume_meter.pack(pady=5)
-        self.volume_meter.set(0)
-        
-        # Test Audio Button
-        self.test_audio_button = ctk.CTkButton(
-            self.volume_frame,
-            text="Monitor",
-            command=self.test_microphone,
-            width=120
-        )
-        self.test_audio_button.pack(pady=5)
-        
-        # Start/Stop button
-        self.start_button = ctk.CTkButton(
-            self.control_panel,
-            text="Start Recording",
-            command=self.toggle_recording
-        )
-        self.start_button.pack(pady=20)
-        
-        # Pause/Resume button
-        self.pause_button = ctk.CTkButton(
-            self.control_panel,
-            text="Pause",
-            command=self.pause_resume_recording,
-            state="disabled"
-        )
-        self.pause_button.pack(pady=5)
-        
-        self.status_label = ctk.CTkLabel(
-            self.control_panel,
-            text="Ready to record"
-        )
-        self.status_label.pack(pady=10)
-        
-        # Recordings frame (right side)
-        self.list_frame = ctk.CTkFrame(self.window)
-        self.list_frame.grid(row=0, column=2, padx=5, pady=5, sticky="nsew")
-        
-        self.list_label = ctk.CTkLabel(
-            self.list_frame,
-            text="Last Recording:",
-            font=("Arial", 14, "bold")
-        )
-        self.list_label.pack(pady=5)
-        
-        # Frame for the last recording
-        self.last_recording_frame = ctk.CTkFrame(self.list_frame)
-        self.last_recording_frame.pack(fill="x", padx=5, pady=5)
-        
-        # Label for the last recording (will be updated)
-        self.last_recording_label = ctk.CTkLabel(
-            self.last_recording_frame,
-            text="No recordings yet",
-            wraplength=200
-        )
-        self.last_recording_label.pack(pady=5)
-        
-        # Buttons frame
-        self.buttons_frame = ctk.CTkFrame(self.list_frame)
-        self.buttons_frame.pack(fill="x", padx=5, pady=5)
-        
-        # Open last recording button
-        self.open_recording_button = ctk.CTkButton(
-            self.buttons_frame,
-            text="Open Recording",
-            command=self.open_last_recording,
-            state="disabled"
-        )
-        self.open_recording_button.pack(side="left", padx=2, pady=5)
-        
-        # Open folder button
-        self.open_folder_button = ctk.CTkButton(
-            self.buttons_frame,
-            text="Open Folder",
-            command=self.open_recordings_folder
-        )
-        self.open_folder_button.pack(side="right", padx=2, pady=5)
-        
-        # Add version control to the control panel
-        self.version_frame = ctk.CTkFrame(self.control_panel)
-        self.version_frame.pack(fill="x", padx=5, pady=5)
-        
-        self.version_label = ctk.CTkLabel(
-            self.version_frame,
-            text=f"Version: {get_version()}"
-        )
-        self.version_label.pack(side="left", padx=5)
-        
-        self.check_updates_button = ctk.CTkButton(
-            self.version_frame,
-            text="Check Updates",
-            command=self.check_for_updates,
-            width=100
-        )
-        self.check_updates_button.pack(side="right", padx=5)
-        
-        # Check for updates on startup
-        self.window.after(1000, self.check_for_updates)
-        
-        self.recording_active = False
-        self.start_time = None
-        
-        # Set up volume callback
-        self.recorder.set_volume_callback(self.update_volume_meter)
+def __getattr__(name):
+    # The GUI lives in recorder_gui so headless use never imports Tk
+    if name == "RecorderGUI":
+        from recorder_gui import RecorderGUI
+        return RecorderGUI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-    def update_timer(self):
-        if self.recording_active and self.start_time:
-            try:
-                elapsed = time.time() - self.start_time - self.recorder.total_pause_duration
-                hours = int(elapsed // 3600)
-                minutes = int((elapsed % 3600) // 60)
-                seconds = int(elapsed % 60)
-                self.timer_label.configure(text=f"{hours:02d}:{minutes:02d}:{seconds:02d}")
-                if self.recording_active:  # Only schedule next update if still recording
-                    self.window.after(1000, self.update_timer)
-            except Exception as e:
-                print(f"Error updating timer: {str(e)}")
 
-    def update_volume_meter(self, volume):
-        self.volume_meter.set(volume / 100)
+def record(duration=None, fps=30.0, region=None, mic=None, out=None, **options):
+    """Record the screen without a GUI and return the path of the finished recording.
 
-    def on_mic_select(self, choice):
-        selected_index = self.mic_names.index(choice)
-        selected_mic = self.available_mics[selected_index]
-        self.recorder.set_microphone(selected_mic['id'])
-        print(f"Selected microphone: {selected_mic['name']} (ID: {selected_mic['id']})")
+    duration is in seconds, or None to record until interrupted with Ctrl+C.
+    region is (left, top, width, height), mic a device id or name fragment
+    (None records no audio) and out either a directory or the .mp4 path to
+    write.  Other keywords set the ScreenRecorder attribute of the same name,
+    e.g. capture_backend, capture_window or output_resolution.
+    """
+    recorder = ScreenRecorder()
+    for name, value in options.items():
+        if not hasattr(recorder, name):
+            raise TypeError(f"Unknown recorder option: {name}")
+        setattr(recorder, name, value)
+    recorder.fps = fps
+    if region:
+        recorder.set_capture_region(region)
+    recorder.set_microphone(recorder.find_microphone(mic))
+    
+    target = None
+    if out:
+        extension = os.path.splitext(out)[1]
+        if extension:
+            expected = container_extension(recorder.output_container)
+            if extension.lower() != expected:
+                raise ValueError(f"{recorder.output_container} output is written as {expected}, not {extension}")
+            target = os.path.abspath(out)
+            recorder.output_dir = os.path.dirname(target)
+            recorder.set_filename(os.path.splitext(os.path.basename(target))[0])
+        else:
+            recorder.output_dir = os.path.abspath(out)
+        os.makedirs(recorder.output_dir, exist_ok=True)
+    
+    recorder.start_recording()
+    try:
+        deadline = None if duration is None else time.monotonic() + duration
+        # Capture stops on its own if the backend fails
+        while recorder.recording and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        print("Interrupted, finishing recording...")
+    finally:
+        recorder.stop_recording()
+    
+    path = recorder.last_recording
+    # Separate monitor files keep their per-monitor names
+    if target and path and len(recorder.last_recordings) <= 1 and os.path.abspath(path) != target:
+        # A container that fell back to plain MP4 keeps its real extension
+        actual = os.path.splitext(path)[1]
+        if actual.lower() != os.path.splitext(target)[1].lower():
+            target = os.path.splitext(target)[0] + actual
+            print(f"Recorded as {actual}; saving to {target}")
+        os.replace(path, target)
+        path = target
+    return path
 
-    def on_cursor_select(self, choice):
-        self.recorder.load_cursor(choice)
 
-    def test_microphone(self):
-        if not self.recording_active:
-            self.test_audio_button.configure(text="Stop Monitoring")
-            self.recording_active = True
-            
-            # Start a brief recording to test the microphone
-            self.recorder.recording = True
-            self.audio_test_thread = threading.Thread(target=self._run_audio_test)
-            self.audio_test_thread.start()
-        else:
-            self.stop_mic_test()
+def container_extension(container):
+    """File extension a recording in `container` ends up with."""
+    return STREAMABLE_CONTAINERS.get(container, ".mp4")
 
-    def stop_mic_test(self):
-        self.recorder.recording = False
-        self.recording_active = False
-        self.test_audio_button.configure(text="Monitor")
-        self.volume_meter.set(0)
 
-    def _run_audio_test(self):
-        try:
-            with sd.InputStream(
-                device=self.recorder.selected_mic_id,
-                callback=self._test_audio_callback,
-                channels=2,
-                samplerate=44100,
-                blocksize=1024  # Smaller blocksize for more frequent updates
-            ):
-                while self.recording_active:
-                    time.sleep(0.1)
-        except Exception as e:
-            print(f"Audio test error: {e}")
-        finally:
-            self.stop_mic_test()
+def parse_region(text):
+    """Parse "LEFT,TOP,WIDTH,HEIGHT" into a capture region tuple."""
+    try:
+        left, top, width, height = (int(v) for v in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected LEFT,TOP,WIDTH,HEIGHT, got '{text}'")
+    return left, top, width, height
 
-    def _test_audio_callback(self, indata, frames, time, status):
-        if status:
-            print(status)
-        # Increase sensitivity and use RMS calculation
-        volume_norm = np.sqrt(np.mean(indata**2)) * 100
-        self.window.after(0, self.volume_meter.set, min(volume_norm, 1.0))
 
-    def toggle_recording(self):
-        try:
-            if not self.recording_active:
-                # Get filename from entry
-                filename = self.filename_entry.get().strip()
-                if filename:
-                    self.recorder.custom_filename = filename
-                
-                # Start recording
-                self.recorder.start_recording()
-                self.recording_active = True  # Set recording active state
-                
-                # Update UI
-                self.start_button.configure(text="Stop Recording")
-                self.pause_button.configure(state="normal")
-                self.status_label.configure(text="Recording...")
-                self.indicator_canvas.itemconfig(self.indicator_light, fill="red")
-                
-                # Start timer
-                self.start_time = time.time()
-                self.window.after(0, self.update_timer)  # Start timer immediately
-                
-                # Update recording list
-                self.update_last_recording()
-                
-            else:
-                # Stop recording
-                self.recording_active = False  # Set recording inactive first
-                self.recorder.stop_recording()
-                
-                # Update UI
-                self.start_button.configure(text="Start Recording")
-                self.pause_button.configure(state="disabled")
-                self.status_label.configure(text="Ready to record")
-                self.indicator_canvas.itemconfig(self.indicator_light, fill="gray")
-                
-                # Reset timer
-                self.timer_label.configure(text="00:00:00")
-                self.start_time = None
-                
-                # Update recording list
-                self.update_last_recording()
-                
-        except Exception as e:
-            print(f"Error in toggle_recording: {str(e)}")
-            traceback.print_exc()
-            # Try to cleanup in case of error
-            self.recording_active = False
-            self.start_button.configure(text="Start Recording")
-            self.pause_button.configure(state="disabled")
-            self.status_label.configure(text="Error occurred")
-            self.indicator_canvas.itemconfig(self.indicator_light, fill="gray")
-
-    def toggle_theme(self):
-        if self.current_theme == "dark":
-            ctk.set_appearance_mode("light")
-            self.current_theme = "light"
-        else:
-            ctk.set_appearance_mode("dark")
-            self.current_theme = "dark"
+def parse_monitors(text):
+    """Parse "all" or comma-separated monitor indexes like "0,2"."""
+    if text.lower() == "all":
+        return "all"
+    try:
+        return [int(v) for v in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected 'all' or monitor indexes like 0,1, got '{text}'")
 
-    def upload_custom_cursor(self):
-        from tkinter import filedialog
-        file_path = filedialog.askopenfilename(
-            filetypes=[("PNG files", "*.png")]
-        )
-        if file_path:
-            cursor_name = os.path.splitext(os.path.basename(file_path))[0]
-            new_path = os.path.join(self.recorder.cursor_dir, f"{cursor_name}.png")
-            import shutil
-            shutil.copy2(file_path, new_path)
-            
-            # Refresh cursor list
-            self.available_cursors = self.recorder.get_available_cursors()
-            self.cursor_menu.configure(values=self.available_cursors)
-            self.cursor_var.set(cursor_name)
-            self.recorder.load_cursor(cursor_name)
-
-    def update_preview(self, frame):
-        if frame is not None and isinstance(frame, np.ndarray):
-            try:
-                # Convert frame to RGB for PIL
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                image = Image.fromarray(frame_rgb)
-                
-                # Create CTkImage with specific size
-                photo = ctk.CTkImage(
-                    light_image=image,
-                    dark_image=image,
-                    size=(640, 360)
-                )
-                
-                # Update canvas
-                self.preview_canvas.delete("all")
-                self.preview_canvas.create_image(
-                    320,  # Center x
-                    180,  # Center y
-                    image=photo,
-                    anchor="center"
-                )
-                self.preview_canvas._image = photo  # Keep reference
-                
-            except Exception as e:
-                print(f"Preview update error: {str(e)}")
-                traceback.print_exc()
 
-    def update_last_recording(self):
-        if self.recorder.last_recording:
-            self.last_recording_label.configure(text=self.recorder.last_recording)
-            self.open_recording_button.configure(state="normal")
+def parse_audio_source(text):
+    """Parse "DEVICE[:GAIN]" into an audio_sources entry; DEVICE is an id or part of a name."""
+    device, _, gain = text.rpartition(":")
+    if device:
+        try:
+            return {"device": device, "gain": float(gain)}
+        except ValueError:
+            pass  # A colon in the device name
+    return {"device": text, "gain": 1.0}
 
-    def open_last_recording(self):
-        if self.recorder.last_recording:
-            import os
-            os.startfile(self.recorder.last_recording)
 
-    def open_recordings_folder(self):
-        import os
-        os.startfile(self.recorder.output_dir)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screen recorder. Opens the GUI when run without a command.")
+    commands = parser.add_subparsers(dest="command")
+    
+    record_parser = commands.add_parser("record", help="Record without the GUI")
+    record_parser.add_argument("--duration", type=float, help="Seconds to record (default: until Ctrl+C)")
+    record_parser.add_argument("--fps", type=float, default=30.0)
+    area = record_parser.add_mutually_exclusive_group()
+    area.add_argument("--region", type=parse_region, help="LEFT,TOP,WIDTH,HEIGHT (default: full screen)")
+    area.add_argument("--window", help="Follow the first window whose title contains this text")
+    area.add_argument("--monitors", type=parse_monitors, help="Record several displays: 'all' or indexes like 0,1 (see 'monitors')")
+    record_parser.add_argument("--monitor-layout", default="composite", choices=["composite", "separate"],
+                               help="One canvas covering the monitors, or one synchronized file per monitor")
+    record_parser.add_argument("--mic", help="Microphone id, 'default' or part of its name (default: no audio)")
+    record_parser.add_argument("--mic-gain", type=float, default=1.0)
+    record_parser.add_argument("--audio-source", action="append", default=[], type=parse_audio_source,
+                               metavar="DEVICE[:GAIN]",
+                               help="Another input to record, e.g. a loopback/monitor device for system audio (repeatable)")
+    record_parser.add_argument("--audio-tracks", default="mix", choices=["mix", "separate"],
+                               help="Mix all inputs into one track or keep one track per input")
+    record_parser.add_argument("--out", help="Output directory or .mp4 path (default: recordings/)")
+    record_parser.add_argument("--backend", default="auto", choices=["auto"] + [b.name for b in BACKENDS])
+    record_parser.add_argument("--resolution", default="native", choices=list(OUTPUT_PRESETS))
+    record_parser.add_argument("--output-mode", default="opencv", choices=["opencv", "ffmpeg"])
+    record_parser.add_argument("--container", default="mp4", choices=["mp4"] + list(STREAMABLE_CONTAINERS),
+                               help="fmp4 or mkv stay playable if the recorder is killed (needs ffmpeg)")
+    record_parser.add_argument("--processes", type=int, default=0, help="Encode in this many worker processes")
+    record_parser.add_argument("--metrics", help="Write live metrics to this file (.prom for Prometheus, else JSON)")
+    record_parser.add_argument("--metrics-interval", type=float, default=5.0, help="Seconds between metrics writes")
+    
+    commands.add_parser("mics", help="List microphones")
+    recover_parser = commands.add_parser("recover", help="Salvage recordings left unfinished by a crash")
+    recover_parser.add_argument("--dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings"),
+                                help="Directory to scan (default: recordings/)")
+    recover_parser.add_argument("--min-age", type=float, default=10.0,
+                                help="Leave files modified this many seconds ago or less alone")
+    monitors_parser = commands.add_parser("monitors", help="List displays")
+    monitors_parser.add_argument("--backend", default="auto", choices=["auto"] + [b.name for b in BACKENDS])
+    args = parser.parse_args(argv)
+    
+    if args.command == "record":
+        extension = os.path.splitext(args.out or "")[1]
+        if extension and extension.lower() != container_extension(args.container):
+            record_parser.error(f"--out {args.out} does not match --container {args.container} "
+                                f"(use a {container_extension(args.container)} path)")
+        path = record(
+            duration=args.duration,
+            fps=args.fps,
+            region=args.region,
+            mic=args.mic,
+            out=args.out,
+            capture_window=args.window,
+            mic_gain=args.mic_gain,
+            audio_sources=args.audio_source,
+            audio_mix_mode=args.audio_tracks,
+            capture_monitors=args.monitors,
+            monitor_layout=args.monitor_layout,
+            capture_backend=args.backend,
+            output_resolution=args.resolution,
+            output_mode=args.output_mode,
+            output_container=args.container,
+            encode_processes=args.processes,
+            metrics_path=args.metrics,
+            metrics_interval=args.metrics_interval
+        )
+        if not path:
+            print("Recording failed")
+            return 1
+        print(f"Saved {path}")
+        return 0
+    if args.command == "mics":
+        for mic in ScreenRecorder().get_available_mics():
+            print(f"{mic['id']:>3}  {mic['name']} ({mic['channels']} ch)")
+        return 0
+    if args.command == "recover":
+        recovered = recover_recordings(args.dir, args.min_age)
+        print(f"Recovered {len(recovered)} recording(s)")
+        return 0
+    if args.command == "monitors":
+        for index, (left, top, width, height) in enumerate(get_monitors(args.backend)):
+            print(f"{index:>3}  {width}x{height} at {left},{top}{' (primary)' if index == 0 else ''}")
+        return 0
+    
+    from recorder_gui import main as run_gui
+    run_gui()
+    return 0
 
-    def pause_resume_recording(self):
-        if self.recorder.paused:
-            self.recorder.paused = False
-            self.pause_button.configure(text="Pause")
-        else:
-            self.recorder.paused = True
-            self.pause_button.configure(text="Resume")
-
-    def check_for_updates(self):
-        """Check for available updates and prompt user."""
-        if self.version_control.check_for_updates():
-            update_info = self.version_control.get_update_info()
-            response = ctk.CTkMessagebox(
-                title="Update Available",
-                message=f"A new version ({update_info['latest_version']}) is available.\nWould you like to update now?",
-                icon="info",
-                option_1="Yes",
-                option_2="No"
-            )
-            
-            if response.get() == "Yes":
-                success, message = self.version_control.download_update()
-                if not success:
-                    ctk.CTkMessagebox(
-                        title="Update Failed",
-                        message=message,
-                        icon="error"
-                    )
 
 if __name__ == "__main__":
-    app = RecorderGUI()
-    app.window.mainloop()
\ No newline at end of file
+    raise SystemExit(main())
\ No newline at end of file
@@ -1,32 +1,150 @@
-import requests
+import hashlib
 import json
 import os
+import shutil
 import sys
 import subprocess
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from packaging import version
 
 CURRENT_VERSION = "1.0.0"
 GITHUB_REPO = "jasonjoplin/screen-recorder"  # Updated with your actual GitHub repository
-VERSION_CHECK_URL = f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest"
+# SCREEN_RECORDER_UPDATE_URL points the check at another server, e.g. a local mirror
+VERSION_CHECK_URL = os.environ.get(
+    "SCREEN_RECORDER_UPDATE_URL",
+    f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest"
+)
+CHECK_TIMEOUT = 5.0  # seconds, for connecting and for each read
+CACHE_TTL = 6 * 3600  # seconds a cached check is trusted without asking the server
+DOWNLOAD_CHUNK = 256 * 1024  # bytes per read when streaming and hashing updates
+DOWNLOAD_RETRIES = 3  # resumed attempts after the connection drops mid-download
+INSTALL_DIR = os.path.dirname(os.path.abspath(__file__))
+PRESERVED_DIRS = ("recordings",)  # user data an update never touches
+MANIFEST_NAME = "manifest.json"  # release asset listing every file's SHA-256, for delta updates
+DELTA_WORKERS = 4  # parallel file downloads (and pooled connections) for delta updates
+
+
+def _default_cache_path():
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "screen-recorder", "update_check.json")
+
 
 class VersionControl:
-    def __init__(self):
+    def __init__(self, check_url=None, cache_path=None, cache_ttl=CACHE_TTL, timeout=CHECK_TIMEOUT):
         self.current_version = CURRENT_VERSION
         self.latest_version = None
         self.update_available = False
+        self.check_url = check_url or VERSION_CHECK_URL
+        self.cache_path = cache_path or _default_cache_path()
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        self.last_error = None
+        self.latest_release = None
+        self.download_dir = os.path.join(os.path.dirname(self.cache_path), "downloads")
+        self.install_dir = INSTALL_DIR
+        self.require_checksum = True  # .zip release assets need a published checksum; the source zipball has none
+        self.restart_after_update = True  # whether the app should call restart() once it is safe to
+        self.restart_needed = False  # set once an update is installed; the running code is still the old one
+        self._executor = None
+        
+    def check_for_updates(self, force=False):
+        """Check if a new version is available.
+
+        A cached result younger than cache_ttl is used without any network
+        I/O (unless force is set); an older one is revalidated with its ETag.
+        If the server cannot be reached the cached result, however old, is
+        used.  Blocks for at most about `timeout` seconds.
+        """
+        cache = self._load_cache()
+        if cache and not force and time.time() - cache.get('checked_at', 0) < self.cache_ttl:
+            return self._apply_release(cache['release'])
         
-    def check_for_updates(self):
-        """Check if a new version is available."""
         try:
-            response = requests.get(VERSION_CHECK_URL)
+            import requests
+            headers = {'Accept': 'application/vnd.github+json'}
+            if cache and cache.get('etag'):
+                headers['If-None-Match'] = cache['etag']
+            response = requests.get(self.check_url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cache:
+                # Unchanged since the cached copy; just restart its TTL
+                cache['checked_at'] = time.time()
+                self._save_cache(cache)
+                return self._apply_release(cache['release'])
             if response.status_code == 200:
                 latest_release = response.json()
-                self.latest_version = latest_release['tag_name'].lstrip('v')
-                self.update_available = version.parse(self.latest_version) > version.parse(self.current_version)
-                return self.update_available
+                release = {
+                    'tag_name': latest_release['tag_name'],
+                    'zipball_url': latest_release.get('zipball_url'),
+                    'assets': [
+                        {'name': asset['name'], 'url': asset['browser_download_url'], 'size': asset.get('size')}
+                        for asset in latest_release.get('assets') or []
+                    ]
+                }
+                self._save_cache({
+                    'checked_at': time.time(),
+                    'etag': response.headers.get('ETag'),
+                    'url': self.check_url,
+                    'release': release
+                })
+                self.last_error = None
+                return self._apply_release(release)
+            self.last_error = f"HTTP {response.status_code}"
         except Exception as e:
-            print(f"Failed to check for updates: {str(e)}")
-            return False
+            self.last_error = str(e)
+        print(f"Failed to check for updates: {self.last_error}")
+        if cache:
+            return self._apply_release(cache['release'])
+        return False
+
+    def check_for_updates_async(self, force=False, callback=None):
+        """Run check_for_updates on a background worker.
+
+        Returns a concurrent.futures.Future resolving to the same boolean.
+        callback, if given, is called with that result on the worker thread,
+        so GUI code should poll the future from its own loop instead.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="update-check")
+        
+        def run():
+            result = self.check_for_updates(force=force)
+            if callback:
+                callback(result)
+            return result
+        return self._executor.submit(run)
+
+    def _apply_release(self, release):
+        self.latest_release = release
+        self.latest_version = release['tag_name'].lstrip('v')
+        self.update_available = version.parse(self.latest_version) > version.parse(self.current_version)
+        return self.update_available
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # A cache written for another endpoint says nothing about this one
+        if cache.get('url') != self.check_url or not cache.get('release', {}).get('tag_name'):
+            return None
+        return cache
+
+    def _save_cache(self, cache):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temp_path = f"{self.cache_path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(cache, f)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not cache update check: {str(e)}")
 
     def get_update_info(self):
         """Get information about the latest update."""
@@ -45,59 +163,374 @@ class VersionControl:
             'update_available': False
         }
 
-    def download_update(self):
-        """Download and install the latest update."""
+    def download_update(self, progress=None):
+        """Download, verify and install the latest update.
+
+        progress, if given, is called as progress(bytes_done, bytes_total)
+        while downloading (bytes_total is None when the server does not say).
+        Returns (success, message).  This may run on a worker thread, so it
+        never restarts the app: after an install restart_needed is set and
+        the caller calls restart() once nothing is recording.
+        """
         if not self.update_available:
             return False, "No updates available"
 
         try:
-            # Download the latest release
-            response = requests.get(f"https://api.github.com/repos/{GITHUB_REPO}/zipball/{self.latest_version}")
-            if response.status_code == 200:
-                # Save the update
-                update_file = "update.zip"
-                with open(update_file, 'wb') as f:
-                    f.write(response.content)
-
-                # Extract and install the update
-                self._install_update(update_file)
-                return True, "Update successful"
-            return False, "Failed to download update"
+            # Only fetch changed files when the release publishes a manifest
+            result = self._delta_update(progress)
+            if result == "unchanged":
+                # Nothing was installed, so there is nothing to restart for
+                self.current_version = self.latest_version
+                self.update_available = False
+                return True, "Already up to date"
+            if result:
+                self._finish_install()
+                return True, "Update installed; restart to finish"
         except Exception as e:
-            return False, f"Update failed: {str(e)}"
+            print(f"Delta update failed ({str(e)}), downloading the full package")
 
-    def _install_update(self, update_file):
-        """Install the downloaded update."""
-        # Implementation depends on your deployment method
-        # This is a basic example
         try:
-            # Create backup of current version
-            os.system("git add .")
-            os.system('git commit -m "Backup before update"')
+            package_url, expected_sha256 = self._release_package()
+            update_file = self._download(package_url, expected_sha256, progress)
+            self._install_update(update_file)
+            return True, "Update installed; restart to finish"
+        except Exception as e:
+            return False, f"Update failed: {str(e)}"
 
-            # Extract update
-            import zipfile
-            with zipfile.ZipFile(update_file, 'r') as zip_ref:
-                zip_ref.extractall("temp_update")
+    def download_update_async(self, progress=None):
+        """Run download_update on the background worker; returns a Future of its result."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="update-check")
+        return self._executor.submit(self.download_update, progress)
 
-            # Copy new files
-            os.system("xcopy /E /Y temp_update\\* .")
+    def _release_package(self):
+        """Return (url, sha256 or None) of the package to install.
 
-            # Clean up
-            os.remove(update_file)
-            os.system("rmdir /S /Q temp_update")
+        Prefers a .zip asset with a published checksum (a "<name>.sha256" or
+        SHA256SUMS asset); raises if the asset has none and require_checksum
+        is set.  Without a .zip asset it falls back to the tag's source
+        zipball, which GitHub serves without a checksum, so only the
+        archive's own CRCs are checked.
+        """
+        release = self.latest_release or {}
+        assets = release.get('assets') or []
+        package = next((asset for asset in assets if asset['name'].endswith('.zip')), None)
+        if package is None:
+            url = release.get('zipball_url') or \
+                f"https://api.github.com/repos/{GITHUB_REPO}/zipball/{release.get('tag_name', self.latest_version)}"
+            return url, None
+
+        checksum_names = (f"{package['name']}.sha256", "SHA256SUMS", "sha256sums.txt")
+        checksum_asset = next((asset for asset in assets if asset['name'] in checksum_names), None)
+        if checksum_asset is None:
+            if self.require_checksum:
+                raise ValueError(f"The release does not publish a SHA-256 checksum for {package['name']}")
+            return package['url'], None
+        import requests
+        response = requests.get(checksum_asset['url'], timeout=self.timeout)
+        response.raise_for_status()
+        return package['url'], _parse_checksum(response.text, package['name'])
+
+    def _download(self, url, expected_sha256, progress=None):
+        """Stream url to disk, resuming after dropped connections, and verify it."""
+        import requests
+        os.makedirs(self.download_dir, exist_ok=True)
+        final_path = os.path.join(self.download_dir, f"update-{self.latest_version}.zip")
+        # Named per version, so a partial file left by an earlier run can be resumed
+        part_path = f"{final_path}.part"
+
+        for attempt in range(DOWNLOAD_RETRIES + 1):
+            try:
+                self._fetch(url, part_path, progress)
+                break
+            except (requests.RequestException, ConnectionError) as e:
+                if attempt == DOWNLOAD_RETRIES:
+                    raise
+                print(f"Download interrupted ({str(e)}), resuming...")
+                time.sleep(min(2 ** attempt, 10))
+
+        if expected_sha256:
+            digest = _sha256_file(part_path)
+            if digest != expected_sha256.lower():
+                os.remove(part_path)
+                raise ValueError(f"Checksum mismatch: expected {expected_sha256}, got {digest}")
+        else:
+            # Nothing published to compare against; at least check the archive's own CRCs
+            with zipfile.ZipFile(part_path) as archive:
+                bad = archive.testzip()
+            if bad:
+                os.remove(part_path)
+                raise ValueError(f"Corrupt update archive ({bad})")
+        os.replace(part_path, final_path)
+        return final_path
+
+    def _fetch(self, url, part_path, progress=None):
+        import requests
+        done = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f"bytes={done}-"} if done else {}
+        with requests.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # Nothing left past what we already have
+                return
+            response.raise_for_status()
+            if response.status_code == 206:
+                mode = 'ab'
+                size = response.headers.get('Content-Range', '').rpartition('/')[2]
+                total = int(size) if size.isdigit() else None
+            else:
+                # The server ignored the range; start over
+                mode = 'wb'
+                done = 0
+                length = response.headers.get('Content-Length')
+                total = int(length) if length and length.isdigit() else None
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK):
+                    f.write(chunk)
+                    done += len(chunk)
+                    if progress:
+                        progress(done, total)
+        if total is not None and done < total:
+            raise ConnectionError(f"Download ended after {done} of {total} bytes")
+
+    def _delta_update(self, progress=None):
+        """Download and install only the files that differ from the release manifest.
+
+        The manifest asset looks like
+            {"version": "1.1.0", "base_url": "https://host/path/",
+             "files": {"screen_recorder.py": {"sha256": "...", "size": 1234}, ...}}
+        where each file is fetched from base_url + its path (by default the
+        tag's raw files on GitHub).  Returns True once installed, "unchanged"
+        if every file already matches and False if the release has no
+        manifest; raises if anything goes wrong, including a manifest that
+        SHA256SUMS does not vouch for, so the caller can fall back to the
+        full package.
+        """
+        manifest = self._fetch_manifest()
+        if manifest is None:
+            return False
+
+        changed = []
+        for relative, entry in manifest['files'].items():
+            if relative.split('/', 1)[0] in PRESERVED_DIRS:
+                continue
+            local_path = os.path.join(self.install_dir, relative)
+            if not os.path.isfile(local_path) or _sha256_file(local_path) != entry['sha256'].lower():
+                changed.append((relative, entry))
+        print(f"Delta update: {len(changed)} of {len(manifest['files'])} files changed")
+        if not changed:
+            return "unchanged"
 
-            # Update version
-            self.current_version = self.latest_version
-            self.update_available = False
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib.parse import quote
+        tag = (self.latest_release or {}).get('tag_name', self.latest_version)
+        base_url = manifest.get('base_url') or f"https://raw.githubusercontent.com/{GITHUB_REPO}/{tag}/"
+        staging_dir = os.path.join(self.install_dir, ".update_staging")
+        shutil.rmtree(staging_dir, ignore_errors=True)
 
-            # Restart application
-            python = sys.executable
-            os.execl(python, python, *sys.argv)
+        # One pooled session shared by the workers keeps connections alive between files
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=DELTA_WORKERS)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        total = sum(entry.get('size') or 0 for _, entry in changed) or None
+        done = [0]
+        lock = threading.Lock()
 
+        def on_bytes(count):
+            with lock:
+                done[0] += count
+                if progress:
+                    progress(done[0], total)
+
+        try:
+            with ThreadPoolExecutor(max_workers=DELTA_WORKERS, thread_name_prefix="update-delta") as pool:
+                futures = [
+                    pool.submit(_fetch_file, session, base_url + quote(relative),
+                                _staged_path(staging_dir, relative), entry['sha256'], self.timeout, on_bytes)
+                    for relative, entry in changed
+                ]
+                for future in futures:
+                    future.result()
+            self._swap_in(staging_dir)
+        finally:
+            session.close()
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        return True
+
+    def _fetch_manifest(self):
+        release = self.latest_release or {}
+        assets = {asset['name']: asset for asset in release.get('assets') or []}
+        if MANIFEST_NAME not in assets:
+            return None
+        import requests
+        response = requests.get(assets[MANIFEST_NAME]['url'], timeout=self.timeout)
+        response.raise_for_status()
+        # Every file's hash comes from the manifest, so it must match SHA256SUMS before it is trusted
+        if "SHA256SUMS" not in assets:
+            raise ValueError("The release does not publish SHA256SUMS to verify its manifest")
+        sums = requests.get(assets["SHA256SUMS"]['url'], timeout=self.timeout)
+        sums.raise_for_status()
+        expected = _parse_checksum(sums.text, MANIFEST_NAME)
+        if hashlib.sha256(response.content).hexdigest() != expected:
+            raise ValueError("Manifest checksum mismatch")
+        return response.json()
+
+    def _install_update(self, update_file):
+        """Install the downloaded update package."""
+        staging_dir = os.path.join(self.install_dir, ".update_staging")
+        try:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            _extract_update(update_file, staging_dir)
+            self._swap_in(staging_dir)
+            os.remove(update_file)
         except Exception as e:
             raise Exception(f"Failed to install update: {str(e)}")
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        self._finish_install()
+
+    def _swap_in(self, staging_dir):
+        """Move every staged file over its counterpart in the install directory.
+
+        os.replace is atomic per file on every platform.  Replaced files are
+        moved aside first, so a failure part-way through restores the old
+        install.
+        """
+        backup_dir = os.path.join(self.install_dir, ".update_backup")
+        shutil.rmtree(backup_dir, ignore_errors=True)
+        replaced = []
+        try:
+            for root, _, files in os.walk(staging_dir):
+                for name in files:
+                    staged = os.path.join(root, name)
+                    relative = os.path.relpath(staged, staging_dir)
+                    target = os.path.join(self.install_dir, relative)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    saved = None
+                    if os.path.exists(target):
+                        saved = os.path.join(backup_dir, relative)
+                        os.makedirs(os.path.dirname(saved), exist_ok=True)
+                        os.replace(target, saved)
+                    replaced.append((target, saved))
+                    os.replace(staged, target)
+        except Exception:
+            for target, saved in reversed(replaced):
+                if saved:
+                    os.replace(saved, target)
+                elif os.path.exists(target):
+                    os.remove(target)
+            raise
+        finally:
+            shutil.rmtree(backup_dir, ignore_errors=True)
+
+    def _finish_install(self):
+        # The new files are in place; they take effect on restart()
+        self.current_version = self.latest_version
+        self.update_available = False
+        self.restart_needed = True
+
+    def restart(self):
+        """Replace this process with a fresh copy of the app to load an installed update.
+
+        Call it from the main thread, and only when nothing is recording or
+        still being finalized.
+        """
+        python = sys.executable
+        os.execl(python, python, *sys.argv)
+
+
+def build_manifest(root=INSTALL_DIR, release_version=CURRENT_VERSION, base_url=None):
+    """Describe every file under root for a release's manifest.json asset."""
+    skipped = set(PRESERVED_DIRS) | {".git", "__pycache__", ".update_staging", ".update_backup"}
+    files = {}
+    for folder, dirs, names in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d not in skipped)
+        for name in sorted(names):
+            if name.endswith(".pyc") or name == MANIFEST_NAME:
+                continue
+            path = os.path.join(folder, name)
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            files[relative] = {'sha256': _sha256_file(path), 'size': os.path.getsize(path)}
+    manifest = {'version': release_version, 'files': files}
+    if base_url:
+        manifest['base_url'] = base_url
+    return manifest
+
+
+def _parse_checksum(text, filename):
+    """Find filename's SHA-256 in a .sha256 file or a SHA256SUMS listing."""
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) == 1 or (len(parts) >= 2 and parts[-1].lstrip('*') == filename):
+            digest = parts[0].lower()
+            if len(digest) == 64 and all(c in "0123456789abcdef" for c in digest):
+                return digest
+    raise ValueError(f"No SHA-256 for {filename} in the published checksums")
+
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _staged_path(staging_dir, relative):
+    staging_dir = os.path.abspath(staging_dir)
+    target = os.path.abspath(os.path.join(staging_dir, relative))
+    if not target.startswith(staging_dir + os.sep):
+        raise ValueError(f"Unsafe path in update: {relative}")
+    return target
+
+
+def _fetch_file(session, url, target, expected_sha256, timeout, on_bytes=None):
+    """Stream one file to target, verifying its SHA-256 on the way."""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    digest = hashlib.sha256()
+    with session.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        with open(target, 'wb') as f:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK):
+                f.write(chunk)
+                digest.update(chunk)
+                if on_bytes:
+                    on_bytes(len(chunk))
+    if digest.hexdigest() != expected_sha256.lower():
+        raise ValueError(f"Checksum mismatch for {url}")
+
+
+def _extract_update(update_file, staging_dir):
+    """Extract an update archive into staging_dir, member by member."""
+    with zipfile.ZipFile(update_file) as archive:
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        # GitHub source zipballs wrap everything in a single owner-repo-sha/ folder
+        tops = {info.filename.split('/', 1)[0] for info in members}
+        prefix = f"{tops.pop()}/" if len(tops) == 1 and all('/' in info.filename for info in members) else ""
+        for info in members:
+            relative = info.filename[len(prefix):]
+            if not relative or relative.split('/', 1)[0] in PRESERVED_DIRS:
+                continue
+            target = _staged_path(staging_dir, relative)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with archive.open(info) as source, open(target, 'wb') as destination:
+                shutil.copyfileobj(source, destination, DOWNLOAD_CHUNK)
+
 
 def get_version():
     """Get the current version of the application."""
     return CURRENT_VERSION
+
+
+if __name__ == "__main__":
+    # Release helper: python version_control.py manifest [output.json]
+    if len(sys.argv) >= 2 and sys.argv[1] == "manifest":
+        text = json.dumps(build_manifest(), indent=2)
+        if len(sys.argv) >= 3:
+            with open(sys.argv[2], 'w') as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+    else:
+        print("Usage: python version_control.py manifest [output.json]")